@@ -1,12 +1,17 @@
+import atexit
+
 import toml
 from flask import Flask
 from flask_cors import CORS
 from pyrogram import Client
 
 from apps.auth_bot import bot
-from apps.telemetr.api import handlers
-from internal.postgres import admin, category, channel, postgres, user
+from apps.telemetr.api import additions, handlers, jobs
+from internal.postgres import (admin, category, channel, postgres, stats,
+                               user)
+from internal.telegram import scheduler
 from internal.telegram.client import TelegramClient
+from pkg.cache import memorycache
 from pkg.log import filelogger
 
 cfg = toml.load("cfg.toml")
@@ -15,9 +20,7 @@ api_id = cfg.get("client").get("api_id")
 api_hash = cfg.get("client").get("api_hash")
 bot_token = cfg.get("auth_bot").get("token")
 
-_client = Client(app_name, api_id, api_hash)
-
-client = TelegramClient(_client)
+_client = Client(app_name, api_id, api_hash, no_updates=True)
 
 
 def configDB(cfg):
@@ -26,7 +29,11 @@ def configDB(cfg):
         user=cfg.get("databases").get("user"),
         password=cfg.get("databases").get("password"),
         host=cfg.get("databases").get("host"),
-        port=cfg.get("databases").get("port")
+        port=cfg.get("databases").get("port"),
+        min_connections=cfg.get("databases").get(
+            "min_connections", postgres.default_min_connections),
+        max_connections=cfg.get("databases").get(
+            "max_connections", postgres.default_max_connections)
     )
     return cfgDB
 
@@ -35,6 +42,10 @@ logger = filelogger.new_logger("api")
 telegram_logger = filelogger.new_logger("telegram")
 db_logger = filelogger.new_logger("db")
 
+client = TelegramClient(_client,
+                        scheduler.new_scheduler(telegram_logger))
+atexit.register(client.stop)
+
 app = Flask(__name__,
             instance_relative_config=cfg.get("secret_key").get("secret_key"))
 
@@ -43,11 +54,30 @@ CORS(app)
 
 cfgDB = configDB(cfg)
 
+response_cache = memorycache.new_cache(
+    maxsize=cfg.get("cache", {}).get("maxsize", memorycache.default_maxsize),
+    ttl=cfg.get("cache", {}).get("ttl", memorycache.default_ttl))
+
+auth_cache = memorycache.new_cache(
+    maxsize=cfg.get("auth", {}).get("maxsize", memorycache.default_maxsize),
+    ttl=cfg.get("auth", {}).get("ttl", additions.auth_ttl))
+
+export_jobs = jobs.new_queue(
+    logger,
+    folder=cfg.get("export", {}).get("folder", jobs.default_folder),
+    workers=cfg.get("export", {}).get("workers", jobs.default_workers),
+    ttl=cfg.get("export", {}).get("ttl", jobs.default_ttl))
+atexit.register(export_jobs.shutdown)
+
 db = postgres.new(cfg=cfgDB, logger=logger)
-user_storage = user.new_storage(db=db, logger=db_logger)
-channel_storage = channel.new_storage(db=db, logger=db_logger)
-category_storage = category.new_storage(db=db, logger=db_logger)
-admin_storage = admin.new_storage(db=db)
+user_storage = user.new_storage(db=db, logger=db_logger,
+                                auth_cache=auth_cache)
+channel_storage = channel.new_storage(db=db, logger=db_logger,
+                                      cache=response_cache)
+category_storage = category.new_storage(db=db, logger=db_logger,
+                                        cache=response_cache)
+admin_storage = admin.new_storage(db=db, auth_cache=auth_cache)
+stats_storage = stats.new_storage(db=db, logger=db_logger)
 
 auth_bot = bot.new(telegram_logger, bot_token, user_storage)
 auth_bot.create_hanlders()
@@ -58,7 +88,11 @@ handlers = handlers.new_handler(logger, app,
                                 channel_storage,
                                 category_storage,
                                 admin_storage,
-                                auth_bot)
+                                auth_bot,
+                                response_cache,
+                                export_jobs,
+                                auth_cache,
+                                stats_storage)
 
 handlers.create_routes()
 
@@ -0,0 +1,115 @@
+import hashlib
+import os
+from typing import Awaitable, Callable
+
+from pkg.log import logger
+from pyrogram.types import ChatPhoto
+
+avatar_extension = ".png"
+partial_suffixes = (".part", ".temp")
+
+
+class AvatarCache:
+    """Класс кэша аватаров каналов на диске.
+    Файл называется по хэшу file_id маленькой фотографии, поэтому
+    неизменившийся аватар повторно не скачивается
+    """
+    def __init__(self, logger: logger.Logger, folder: str):
+        self.logger = logger
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.index = {entry.name for entry in os.scandir(folder)
+                      if entry.is_file()
+                      and entry.name.endswith(avatar_extension)}
+
+    def path(self, file_id: str) -> str:
+        """Метод получения пути к файлу аватара
+
+        :param file_id:
+            file_id фотографии
+            :type file_id: str
+        :return: Путь к файлу
+        :rtype: str
+        """
+        name = hashlib.sha1(file_id.encode()).hexdigest()
+        return os.path.join(self.folder, name + avatar_extension)
+
+    async def get(self, photo: ChatPhoto,
+                  download: Callable[..., Awaitable]) -> str:
+        """Метод получения аватара канала.
+        Файл скачивается только если такой фотографии ещё нет на диске,
+        запись идёт во временный файл, который затем переименовывается
+
+        :param photo:
+            Фотография чата
+            :type photo: ChatPhoto
+        :param download:
+            Функция скачивания файла по file_id
+            :type download: Callable[..., Awaitable]
+        :return: Путь к файлу аватара или пустая строка
+        :rtype: str
+        """
+        if photo is None:
+            return ""
+        file_name = self.path(photo.small_file_id)
+        if os.path.basename(file_name) in self.index:
+            return file_name
+
+        tmp_name = file_name + ".part"
+        try:
+            result = await download(message=photo.small_file_id,
+                                    file_name=tmp_name)
+            if result is None:
+                return ""
+            os.replace(tmp_name, file_name)
+        except Exception:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+        self.index.add(os.path.basename(file_name))
+        self.logger.info(f"Аватар загружен. Файл: {file_name}")
+        return file_name
+
+    def collect(self, used: set[str]) -> list[str]:
+        """Метод удаления аватаров, на которые больше не ссылается
+        ни один канал, и недокачанных файлов
+
+        :param used:
+            Пути к используемым аватарам
+            :type used: set[str]
+        :return: Удалённые файлы
+        :rtype: list[str]
+        """
+        used = {os.path.basename(path) for path in used}
+        removed = []
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or entry.name in used:
+                continue
+            if not (entry.name.endswith(avatar_extension)
+                    or entry.name.endswith(partial_suffixes)):
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                self.logger.error(f"Ошибка удаления аватара {entry.path} - {e}") # noqa
+                continue
+            self.index.discard(entry.name)
+            removed.append(entry.path)
+        if removed != []:
+            self.logger.info(f"Удалено {len(removed)} неиспользуемых аватаров") # noqa
+        return removed
+
+
+def new_cache(logger: logger.Logger, folder: str) -> AvatarCache:
+    """Создание нового кэша аватаров
+
+    :param logger:
+        Логгер проекта
+        :type logger: logger.Logger
+    :param folder:
+        Папка с аватарами
+        :type folder: str
+    :return: Кэш аватаров
+    :rtype: AvatarCache
+    """
+    return AvatarCache(logger=logger, folder=folder)
@@ -1,17 +1,32 @@
+import asyncio
 import datetime
+import time
 from dataclasses import dataclass
 from zoneinfo import ZoneInfo
 
+from apps.fetcher import metrics
+from apps.fetcher.avatars import AvatarCache
+from apps.fetcher.refresh import RefreshScheduler
 from internal.channels import channel
+from internal.posts import post
+from internal.stats import stats
 from internal.telegram.client import TelegramClient
+from internal.telegram.scheduler import RequestScheduler
 from pkg.log import logger
+from pyrogram.errors import RPCError
 from pyrogram.errors.exceptions import ChannelPrivate
 from pyrogram.types import Dialog, Message
 
 tz = ZoneInfo("Europe/Moscow")
 
 DAYS = 14
+MESSAGES_BATCH = 200
 channel_img_folder = "channel_img/"
+default_workers = 8
+default_stats_retention = 12
+default_dialogs_interval = 30 * 60
+default_flush_size = 100
+default_flush_interval = 60
 
 
 @dataclass
@@ -20,206 +35,451 @@ class Fetcher:
     logger: logger.Logger
     tg_client: TelegramClient
     channel_storage: channel.Storage
+    post_storage: post.Storage
+    stats_storage: stats.Storage
+    scheduler: RequestScheduler
+    avatars: AvatarCache
+    workers: int = default_workers
+    stats_retention: int = default_stats_retention
+    flush_size: int = default_flush_size
+    flush_interval: float = default_flush_interval
 
     async def get_stats(self) -> list[channel.Channel]:
-        """Метод получения списка каналов с данными
+        """Метод получения списка каналов с данными.
+        Каналы обрабатываются параллельно, но не более чем workers
+        задачами одновременно. Средний охват и ER считаются для всех
+        каналов сразу после обхода
 
         :return: Список объектов каналов
         :rtype: list[Channel]
         """
         channel_list = []
+        posts = []
         async with self.tg_client.client:
-            dialogs = await self.tg_client.client.get_dialogs()
-            for dialog in dialogs:
-                if dialog.chat.type == "channel":
-                    invite_link = await self.get_chat_info(dialog.chat.id)
-                    try:
-                        try:
-                            print(dialog.chat.title + f" {dialog.chat.id}")
-                            photo_id = dialog.chat.photo.small_file_id
-                            file_name = f"{channel_img_folder + photo_id}.png"
-                            await self.tg_client.client.download_media(message=photo_id, # noqa
-                                                                       file_name=file_name) # noqa
-                            self.logger.info(f"Аватар канала {dialog.chat.title} загружен. Файл: {file_name}") # noqa
-
-                        except AttributeError:
-                            file_name = ""
-
-                        if dialog.chat.username is None:
-                            self.logger.info(f"Канал: {dialog.chat.title}")
-                        else:
-                            self.logger.info(f"Канал: {dialog.chat.username}")
-
-
-                        messages = await self.get_channel_messages(dialog.chat.id, DAYS) # noqa
-
-                        views = self.count_channel_views(messages)
-
-                        avg_views = self.count_avg_views(views)
-
-                        er = self.count_er(avg_views,
-                                           dialog.chat.members_count)
-
-                        res_dict = self.stats_to_channel(dialog,
-                                                         invite_link,
-                                                         avg_views,
-                                                         views,
-                                                         er,
-                                                         file_name)
-                        channel_list.append(transponse_channel(res_dict))
-                    except ChannelPrivate:
-                        self.logger.info(f"Канал {dialog.chat.title} не публичный") # noqa
-        channel_list = self.count_cpm(channel_list)
+            dialogs = await self.get_channel_dialogs()
+            semaphore = asyncio.Semaphore(self.workers)
+            tasks = [asyncio.create_task(self.get_channel_stats(dialog,
+                                                                semaphore))
+                     for dialog in dialogs.values()]
+            for task in asyncio.as_completed(tasks):
+                try:
+                    result = await task
+                except Exception as e:
+                    self.logger.error(f"Ошибка получения данных канала - {e}") # noqa
+                    continue
+                if result is not None:
+                    channel_list.append(result[0])
+                    posts.append(result[1])
+        metrics.apply(channel_list, posts, DAYS)
         return channel_list
 
-    async def get_chat_info(self, dialog_id: int):
-        _chat = await self.tg_client.client.get_chat(dialog_id)
+    async def get_channel_dialogs(self) -> dict[int, Dialog]:
+        """Метод получения диалогов каналов
+
+        :return: Диалоги каналов по ID чата
+        :rtype: dict[int, Dialog]
+        """
+        dialogs = await self.scheduler.call(self.tg_client.client.get_dialogs)
+        return {dialog.chat.id: dialog for dialog in dialogs
+                if dialog.chat.type == "channel"}
+
+    async def get_channel_stats(self, dialog: Dialog,
+                                semaphore: asyncio.Semaphore) -> tuple: # noqa
+        """Метод получения данных и постов одного канала
+
+        :param dialog:
+            Объект диалога
+            :type dialog: Dialog
+        :param semaphore:
+            Семафор, ограничивающий число одновременно обрабатываемых каналов
+            :type semaphore: asyncio.Semaphore
+        :return: Объект канала и его посты за период или None,
+            если канал не публичный
+        :rtype: tuple[Channel, list[Post]] | None
+        """
+        async with semaphore:
+            try:
+                invite_link, members_count = await self.get_chat_info(
+                    dialog.chat.id)
+                try:
+                    file_name = await self.avatars.get(dialog.chat.photo,
+                                                       self.download_media)
+                except (RPCError, OSError, asyncio.TimeoutError) as e:
+                    self.logger.error(f"Ошибка загрузки аватара канала {dialog.chat.title} - {e}") # noqa
+                    file_name = ""
+
+                if dialog.chat.username is None:
+                    self.logger.info(f"Канал: {dialog.chat.title}")
+                else:
+                    self.logger.info(f"Канал: {dialog.chat.username}")
+
+                posts = await self.get_channel_posts(dialog.chat.id, DAYS)
+
+                res_dict = self.stats_to_channel(dialog,
+                                                 invite_link,
+                                                 file_name,
+                                                 members_count)
+                return transponse_channel(res_dict), posts
+            except ChannelPrivate:
+                self.logger.info(f"Канал {dialog.chat.title} не публичный") # noqa
+                return None
+
+    async def download_media(self, **kwargs):
+        """Метод скачивания файла через планировщик запросов
+
+        :return: Путь к скачанному файлу
+        :rtype: str | None
+        """
+        return await self.scheduler.call(self.tg_client.client.download_media, # noqa
+                                         **kwargs)
+
+    async def get_chat_info(self, dialog_id: int) -> tuple:
+        """Метод получения ссылки и актуального числа подписчиков канала
+
+        :param dialog_id:
+            ID чата
+            :type dialog_id: int
+        :return: Ссылка на канал и число подписчиков
+        :rtype: tuple[str, int]
+        """
+        _chat = await self.scheduler.call(self.tg_client.client.get_chat,
+                                          dialog_id)
         try:
             if _chat.invite_link is None:
-                return _chat.username
-            return _chat.invite_link
+                return _chat.username, _chat.members_count
+            return _chat.invite_link, _chat.members_count
         except Exception as e:
             print(e)
+            return None, None
 
     async def update_db_data(self):
         """Метод вставки данных по каналам в БД"""
         channel_list = await self.get_stats()
-        for _channel in channel_list:
-            self.channel_storage.update_data_from_fetcher(_channel)
+        cpm = self.channel_storage.update_many_from_fetcher(channel_list)
+        if cpm:
+            self.save_snapshots(channel_list, cpm)
+        self.drop_expired_stats()
+        self.collect_avatars(channel_list)
         self.logger.info("Работа фетчера окончена. Инициализация через 30 минут") # noqa
 
+    async def refresh_channel(self, dialog: Dialog,
+                              refresh: RefreshScheduler,
+                              semaphore: asyncio.Semaphore) -> tuple:
+        """Метод получения данных одного канала, которого пора обновить.
+        Канал, данные которого получить не удалось, сразу возвращается
+        в очередь
+
+        :param dialog:
+            Диалог канала
+            :type dialog: Dialog
+        :param refresh:
+            Планировщик обновления каналов
+            :type refresh: RefreshScheduler
+        :param semaphore:
+            Семафор, ограничивающий число одновременно обрабатываемых каналов
+            :type semaphore: asyncio.Semaphore
+        :return: Объект канала и его посты за период или None
+        :rtype: tuple[Channel, list[Post]] | None
+        """
+        try:
+            result = await self.get_channel_stats(dialog, semaphore)
+        except Exception as e:
+            self.logger.error(f"Ошибка обновления канала {dialog.chat.title} - {e}") # noqa
+            refresh.retry(dialog.chat.id, time.time())
+            return None
+        if result is None:
+            refresh.postpone(dialog.chat.id, time.time())
+        return result
+
+    def flush_refreshed(self, pending: list[tuple],
+                        refresh: RefreshScheduler) -> list[channel.Channel]:
+        """Метод записи накопленных обновлений каналов одним пакетом.
+        Метрики считаются для всей пачки сразу, каналы обновляются одним
+        UPDATE, снимки сохраняются одним COPY, после чего каналы заново
+        ставятся в очередь с интервалом по их активности
+
+        :param pending:
+            Каналы и их посты за период
+            :type pending: list[tuple[Channel, list[Post]]]
+        :param refresh:
+            Планировщик обновления каналов
+            :type refresh: RefreshScheduler
+        :return: Записанные каналы
+        :rtype: list[Channel]
+        """
+        now = time.time()
+        channel_list = [item for item, _ in pending]
+        try:
+            metrics.apply(channel_list, [posts for _, posts in pending], DAYS)
+            cpm = self.channel_storage.update_many_from_fetcher(channel_list)
+            if cpm:
+                self.save_snapshots(channel_list, cpm)
+        except Exception as e:
+            self.logger.error(f"Ошибка записи {len(pending)} каналов - {e}")
+            for item in channel_list:
+                refresh.retry(int(item.tg_id), now)
+            return []
+
+        for item, posts in pending:
+            interval = refresh.reschedule(int(item.tg_id), now,
+                                          len(posts) / DAYS,
+                                          item.avg_coverage)
+            if interval is not None:
+                self.logger.info(f"Канал {item.name} обновится через {int(interval)} сек") # noqa
+        self.logger.info(f"Записано каналов: {len(channel_list)}")
+        return channel_list
+
+    async def run_refresh(self, refresh: RefreshScheduler,
+                          dialogs_interval: float):
+        """Метод непрерывного обновления каналов по планировщику.
+        Одновременно обновляется не более workers каналов, следующий
+        канал берётся из очереди, как только освобождается место, общий
+        темп запросов ограничивает планировщик запросов. Результаты
+        записываются в БД пачками по flush_size каналов или раз
+        в flush_interval секунд. Список каналов, история и аватары
+        обслуживаются раз в dialogs_interval секунд
+
+        :param refresh:
+            Планировщик обновления каналов
+            :type refresh: RefreshScheduler
+        :param dialogs_interval:
+            Интервал обновления списка каналов в секундах
+            :type dialogs_interval: float
+        """
+        dialogs = {}
+        known = {}
+        running = set()
+        pending = []
+        pending_at = None
+        dialogs_at = None
+        semaphore = asyncio.Semaphore(self.workers)
+        async with self.tg_client.client:
+            while True:
+                now = time.time()
+                dialogs_due = dialogs_at is None or now - dialogs_at >= dialogs_interval # noqa
+                if pending != [] and (dialogs_due
+                                      or len(pending) >= self.flush_size
+                                      or now - pending_at >= self.flush_interval): # noqa
+                    known.update((int(item.tg_id), item) for item
+                                 in self.flush_refreshed(pending, refresh))
+                    pending = []
+                    pending_at = None
+
+                if dialogs_due:
+                    dialogs = await self.get_channel_dialogs()
+                    refresh.sync(dialogs, now)
+                    known = {key: item for key, item in known.items()
+                             if key in dialogs}
+                    self.drop_expired_stats()
+                    if dialogs_at is not None:
+                        self.collect_avatars(list(known.values()))
+                    dialogs_at = now
+                    self.logger.info(f"Каналов в очереди: {len(refresh)}")
+
+                for key in refresh.pop_due(now, self.workers - len(running)):
+                    running.add(asyncio.create_task(
+                        self.refresh_channel(dialogs[key], refresh,
+                                             semaphore)))
+
+                wake = dialogs_at + dialogs_interval
+                next_due = refresh.next_due()
+                if next_due is not None and len(running) < self.workers:
+                    wake = min(wake, next_due)
+                if pending_at is not None:
+                    wake = min(wake, pending_at + self.flush_interval)
+                timeout = max(wake - now, 1)
+                if running == set():
+                    await asyncio.sleep(timeout)
+                    continue
+
+                done, running = await asyncio.wait(
+                    running, timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result is not None:
+                        pending.append(result)
+                        if pending_at is None:
+                            pending_at = time.time()
+
+    def collect_avatars(self, channel_list: list[channel.Channel]):
+        """Метод удаления аватаров, не используемых ни каналами цикла,
+        ни каналами каталога
+
+        :param channel_list:
+            Список каналов цикла
+            :type channel_list: list[Channel]
+        """
+        used = self.channel_storage.get_photo_paths()
+        if used is None:
+            return
+        used.update(item.photo_path for item in channel_list)
+        self.avatars.collect(used)
+
+    def save_snapshots(self, channel_list: list[channel.Channel],
+                       cpm: dict):
+        """Метод сохранения снимков статистики каналов каталога
+
+        :param channel_list:
+            Список каналов с данными
+            :type channel_list: list[Channel]
+        :param cpm:
+            Пересчитанный CPM каналов каталога по Telegram ID
+            :type cpm: dict[str, int]
+        """
+        fetched_at = datetime.datetime.now(tz)
+        snapshots = [stats.Snapshot(tg_id=item.tg_id,
+                                    fetched_at=fetched_at,
+                                    sub_count=item.sub_count,
+                                    avg_coverage=item.avg_coverage,
+                                    er=item.er,
+                                    cpm=cpm[item.tg_id])
+                     for item in channel_list if item.tg_id in cpm]
+        self.stats_storage.save(snapshots)
+
+    def drop_expired_stats(self):
+        """Метод удаления истории старше stats_retention месяцев"""
+        if self.stats_retention > 0:
+            fetched_at = datetime.datetime.now(tz)
+            month = fetched_at.month - self.stats_retention
+            before = fetched_at.replace(year=fetched_at.year + (month - 1) // 12, # noqa
+                                        month=(month - 1) % 12 + 1,
+                                        day=1, hour=0, minute=0,
+                                        second=0, microsecond=0)
+            self.stats_storage.drop_before(before)
+
+    async def get_channel_posts(self,
+                                channel_id: int,
+                                days: int) -> list[post.Post]:
+        """Метод получения постов канала за период.
+        История из Telegram листается только до контрольной точки,
+        просмотры берутся из полученных страниц, а отдельно запрашиваются
+        только сохранённые посты старше самого старого полученного
+        сообщения
+
+        :param channel_id: ID чата
+        :type channel_id: int
+        :param days: Период в днях с которого нужно получить сообщения
+        :type days: int
+        :return: Список постов канала за период
+        :rtype: list[Post]
+        """
+        tg_id = str(channel_id)
+        since = metrics.get_cutoff(days)
+
+        checkpoint = self.post_storage.get_checkpoint(tg_id)
+        if checkpoint is None:
+            checkpoint = post.Checkpoint(tg_id=tg_id,
+                                         last_message_id=0,
+                                         last_message_date=0)
+
+        messages = await self.get_channel_messages(channel_id, days,
+                                                   checkpoint.last_message_id) # noqa
+        oldest = None
+        if messages != []:
+            oldest = min(message.message_id for message in messages)
+            if messages[0].message_id > checkpoint.last_message_id:
+                checkpoint.last_message_id = messages[0].message_id
+                checkpoint.last_message_date = messages[0].date
+
+        posts = {}
+        for message in messages:
+            if (message.views is not None) and (message.date >= since):
+                posts[message.message_id] = message_to_post(tg_id, message)
+
+        stored = [item.message_id for item in self.post_storage.get_posts(tg_id, since) # noqa
+                  if oldest is None or item.message_id < oldest]
+        for message in await self.refresh_views(channel_id, stored):
+            posts[message.message_id] = message_to_post(tg_id, message)
+
+        posts = list(posts.values())
+        self.post_storage.save(checkpoint, posts)
+        return posts
+
     async def get_channel_messages(self,
                                    channel_id: int,
-                                   days: int) -> list[Message]:
-        """Метод получения сообщений из канала
+                                   days: int,
+                                   last_message_id: int = 0) -> list[Message]: # noqa
+        """Метод получения сообщений из канала.
+        Страницы истории запрашиваются, пока не будет достигнуто сообщение
+        last_message_id или начало периода
 
         :param channel_id: ID чата
         :type channel_id: int
         :param days: Период в днях с которого нужно получить сообщения
         :type days: int
-        :return: Список сообщений из канала
+        :param last_message_id:
+            ID последнего уже полученного сообщения, defaults to 0
+            :type last_message_id: int, optional
+        :return: Список всех полученных сообщений, включая уже сохранённые
         :rtype: list[Message]
         """
         messages_list = []
         offset = 0
 
-        messages = await self.tg_client.client.get_history(channel_id)
+        messages = await self.scheduler.call(self.tg_client.client.get_history, # noqa
+                                             channel_id)
 
         self.logger.info("Получены 100 сообщений")
         messages_list = messages
 
-        while (messages != []) and (datetime.datetime.fromtimestamp(messages[-1].date, tz) >= datetime.datetime.now(tz) - datetime.timedelta(days=days)): # noqa
+        while (messages != []) and (messages[-1].message_id > last_message_id) and (messages[-1].date >= metrics.get_cutoff(days)): # noqa
             offset += 100
-            messages = await self.tg_client.client.get_history(channel_id,
-                                                               offset=offset)
+            messages = await self.scheduler.call(self.tg_client.client.get_history, # noqa
+                                                 channel_id,
+                                                 offset=offset)
             self.logger.info("Получены дополнительные 100 сообщений")
             messages_list.extend(messages)
 
         return messages_list
 
-    def count_channel_views(self, messages: list[Message]) -> list[int, int]: # noqa
-        """Метод подсчёта общего числа просмотров канала
+    async def refresh_views(self,
+                            channel_id: int,
+                            message_ids: list[int]) -> list[Message]:
+        """Метод обновления просмотров уже сохранённых постов
 
-        :param messages: Список полученных сообщений за период
-        :type messages: list[Message]
-        :return: Список просмотров и кол-во сообщений за период
-        :rtype: list[int, int]
-        """
-        views_list = []
-        message_count = 0
-        cur_date = datetime.datetime.now(tz)
-        delta_date = cur_date - datetime.timedelta(days=DAYS)
-        for message in messages:
-            message_stamp = datetime.datetime.fromtimestamp(message.date, tz)
-            # if (message.views is not None) and (datetime.datetime.fromtimestamp(message.date, tz) >= datetime.datetime.now(tz) - datetime.timedelta(days=DAYS)): # noqa
-            if (message.views is not None) and (message_stamp >= delta_date):
-                views_list.append(message.views)
-                message_count += 1
-        views = [sum(views_list), message_count]
-        return views
-
-    def count_avg_views(self, views: list[int, int]) -> int:
-        """Метод подсчёта среднего охвата
-
-        :param views: Список просмотров и кол-ва сообщений за период
-        :type views: list[int, int]
-        :return: Значение среднего охвата
-        :rtype: int
-        """
-        try:
-            avg_views = views[0] / views[1]
-            return avg_views
-        except ZeroDivisionError:
-            # TODO забор прошлых данных
-            return 0
-
-    def count_er(self, avg_views: int, participants: int) -> int:
-        """Метод подсчёта показателя вовлечённости (ER)
-
-        :param avg_views: Средний охват
-        :type avg_views: int
-        :param participants: Число участников
-        :type participants: int
-        :return: Показатель ER
-        :rtype: int
-        """
-        try:
-            er = avg_views / participants
-            return er * 100
-        except ZeroDivisionError:
-            self.logger.info("Новые сообщения не обнаружены")
-            # TODO забор прошлых данных
-            er = 0
-            return er
-
-    def count_cpm(self, channel_list: list) -> list:
-        """Метод подсчёта cpm по каналу
-
-        :param channel_list: Список каналов по которым собрана статистика
-        :type channel_list: list
-        :return: Список с обновлёным полем cpm
-        :rtype: list
+        :param channel_id: ID чата
+        :type channel_id: int
+        :param message_ids: ID сообщений, просмотры которых нужно обновить
+        :type message_ids: list[int]
+        :return: Список существующих сообщений
+        :rtype: list[Message]
         """
-        for current_channel in channel_list:
-            _channel = self.channel_storage.get_channel_by_teleg_id(current_channel.tg_id) # noqa
-            # print(current_channel, _channel)
-            if _channel == []:
-                pass
-            else:
-                try:
-                    current_channel.cpm = (_channel.post_price / current_channel.avg_coverage) * 1000 # noqa
-                except ZeroDivisionError:
-                    current_channel.cpm = 0
-        return channel_list
+        messages_list = []
+        for i in range(0, len(message_ids), MESSAGES_BATCH):
+            messages = await self.scheduler.call(
+                self.tg_client.client.get_messages,
+                channel_id, message_ids[i:i + MESSAGES_BATCH])
+            messages_list.extend(message for message in messages
+                                 if not message.empty and message.views is not None) # noqa
+        self.logger.info(f"Обновлены просмотры {len(messages_list)} сообщений") # noqa
+        return messages_list
 
     def stats_to_channel(self, dialog: Dialog,
                          invite_link: str,
-                         avg_views: int,
-                         views_list: list[int, int],
-                         er: int,
-                         photo_path: str) -> dict:
+                         photo_path: str,
+                         members_count: int = None) -> dict:
         """Метод конвертации данных в объект
 
         :param dialog:
             Объект диалога
             :type dialog: Dialog
-        :param avg_views:
-            Средний охват
-            :type avg_views: int
-        :param views_list:
-            Список просмотров и число сообщений
-            :type views_list: list[int, int]
-        :param er:
-            Показатель вовлечённости
-            :type er: int
+        :param invite_link:
+            Ссылка на канал
+            :type invite_link: str
+        :param photo_path:
+            Путь к аватару канала
+            :type photo_path: str
+        :param members_count:
+            Число подписчиков из get_chat, defaults to None
+            :type members_count: int, optional
         :return: Словарь с данными о канале
         :rtype: dict
         """
+        if members_count is None:
+            members_count = dialog.chat.members_count
         data = {"channel_name": dialog.chat.title,
-                "mem_count": dialog.chat.members_count,
-                "count": views_list[0],
-                "avg_views": round(avg_views),
-                "er": round(er, 1),
+                "mem_count": members_count,
                 "channel_id": dialog.chat.id,
                 "tg_link": invite_link,
                 "tg_id": str(dialog.chat.id),
@@ -232,6 +492,39 @@ class Fetcher:
         self.logger.info("Началась работа фетчера")
         self.tg_client.client.run(self.update_db_data())
 
+    def watch(self, refresh: RefreshScheduler,
+              dialogs_interval: float = default_dialogs_interval):
+        """Точка инициализации фетчера в режиме непрерывного обновления
+
+        :param refresh:
+            Планировщик обновления каналов
+            :type refresh: RefreshScheduler
+        :param dialogs_interval:
+            Интервал обновления списка каналов в секундах,
+            defaults to 1800
+            :type dialogs_interval: float, optional
+        """
+        self.logger.info("Началась работа фетчера")
+        self.tg_client.client.run(self.run_refresh(refresh, dialogs_interval))
+
+
+def message_to_post(tg_id: str, message: Message) -> post.Post:
+    """Функция преобразования сообщения Telegram в пост
+
+    :param tg_id:
+        Telegram ID канала
+        :type tg_id: str
+    :param message:
+        Сообщение из канала
+        :type message: Message
+    :return: Объект поста
+    :rtype: Post
+    """
+    return post.Post(tg_id=tg_id,
+                     message_id=message.message_id,
+                     date=message.date,
+                     views=message.views)
+
 
 def transponse_channel(data: dict):
     """Функция преобразовния словаря в объект
@@ -250,8 +543,8 @@ def transponse_channel(data: dict):
         tg_id=data["tg_id"],
         category="",
         sub_count=data["mem_count"],
-        avg_coverage=data["avg_views"],
-        er=data["er"],
+        avg_coverage=0,
+        er=0,
         cpm=0,
         post_price=0,
         photo_path=data['photo_path']
@@ -0,0 +1,213 @@
+import time
+
+import numpy as np
+from internal.channels.channel import Channel
+from internal.posts.post import Post
+
+seconds_in_hour = 3600
+seconds_in_day = 86400
+trim = 0.1
+
+reach_ages = {"reach_24h": 24, "reach_48h": 48}
+
+reach_fields = ("median_views", "trimmed_views", "p25_views", "p75_views",
+                "reach_24h", "reach_48h")
+
+
+def get_cutoff(days: int, now: float = None) -> int:
+    """Функция получения начала периода в unix timestamp
+
+    :param days:
+        Период в днях
+        :type days: int
+    :param now:
+        Текущее время, defaults to None
+        :type now: float, optional
+    :return: Начало периода
+    :rtype: int
+    """
+    if now is None:
+        now = time.time()
+    return int(now) - days * seconds_in_day
+
+
+def gather(posts: list[list[Post]]) -> dict:
+    """Функция сбора постов всех каналов цикла в массивы по полям
+
+    :param posts:
+        Посты каждого канала
+        :type posts: list[list[Post]]
+    :return: Индекс канала, дата и просмотры каждого поста
+    :rtype: dict[str, np.ndarray]
+    """
+    lengths = np.fromiter((len(items) for items in posts), dtype=np.int64,
+                          count=len(posts))
+    total = int(lengths.sum())
+    return {
+        "channel": np.repeat(np.arange(len(posts)), lengths),
+        "date": np.fromiter((item.date for items in posts for item in items),
+                            dtype=np.int64, count=total),
+        "views": np.fromiter((np.nan if item.views is None else item.views
+                              for items in posts for item in items),
+                             dtype=float, count=total),
+    }
+
+
+def sort_groups(channel: np.ndarray, values: np.ndarray,
+                size: int) -> tuple:
+    """Функция сортировки значений внутри каждого канала
+
+    :param channel:
+        Индекс канала каждого значения
+        :type channel: np.ndarray
+    :param values:
+        Значения
+        :type values: np.ndarray
+    :param size:
+        Число каналов
+        :type size: int
+    :return: Отсортированные значения, начало и размер группы каждого канала
+    :rtype: tuple[np.ndarray, np.ndarray, np.ndarray]
+    """
+    order = np.lexsort((values, channel))
+    count = np.bincount(channel, minlength=size)
+    starts = np.cumsum(count) - count
+    return values[order], starts, count
+
+
+def group_quantile(values: np.ndarray, starts: np.ndarray,
+                   count: np.ndarray, q: float) -> np.ndarray:
+    """Функция квантиля каждой группы с линейной интерполяцией
+
+    :param values:
+        Значения, отсортированные внутри групп
+        :type values: np.ndarray
+    :param starts:
+        Начало каждой группы
+        :type starts: np.ndarray
+    :param count:
+        Размер каждой группы
+        :type count: np.ndarray
+    :param q:
+        Квантиль от 0 до 1
+        :type q: float
+    :return: Квантиль группы, 0 для пустых групп
+    :rtype: np.ndarray
+    """
+    result = np.zeros(count.size)
+    has = count > 0
+    position = starts[has] + q * (count[has] - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    result[has] = values[low] + (values[high] - values[low]) * (position - low) # noqa
+    return result
+
+
+def group_trimmed_mean(values: np.ndarray, starts: np.ndarray,
+                       count: np.ndarray) -> np.ndarray:
+    """Функция усечённого среднего каждой группы.
+    С каждого края группы отбрасывается доля trim значений
+
+    :param values:
+        Значения, отсортированные внутри групп
+        :type values: np.ndarray
+    :param starts:
+        Начало каждой группы
+        :type starts: np.ndarray
+    :param count:
+        Размер каждой группы
+        :type count: np.ndarray
+    :return: Усечённое среднее группы, 0 для пустых групп
+    :rtype: np.ndarray
+    """
+    cut = np.floor(count * trim).astype(np.int64)
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    low = starts + cut
+    high = starts + count - cut
+    return np.divide(sums[high] - sums[low], high - low,
+                     out=np.zeros(count.size), where=high > low)
+
+
+def compute(columns: dict, members: np.ndarray, cutoff: int,
+            now: int) -> dict:
+    """Функция расчёта метрик всех каналов за один проход
+
+    :param columns:
+        Индекс канала, дата и просмотры каждого поста
+        :type columns: dict[str, np.ndarray]
+    :param members:
+        Число подписчиков каждого канала
+        :type members: np.ndarray
+    :param cutoff:
+        Начало периода, unix timestamp
+        :type cutoff: int
+    :param now:
+        Текущее время, unix timestamp
+        :type now: int
+    :return: Сумма просмотров, число постов, средний охват, ER,
+        медиана, усечённое среднее, p25/p75 и охват поста к 24 и 48 часам
+    :rtype: dict[str, np.ndarray]
+    """
+    size = members.size
+    mask = (columns["date"] >= cutoff) & ~np.isnan(columns["views"])
+    channel = columns["channel"][mask]
+    views = columns["views"][mask]
+    age = now - columns["date"][mask]
+
+    total = np.bincount(channel, weights=views, minlength=size)
+    count = np.bincount(channel, minlength=size)
+    avg_views = np.divide(total, count, out=np.zeros(size),
+                          where=count > 0)
+    er = np.divide(avg_views * 100, members, out=np.zeros(size),
+                   where=members > 0)
+
+    ordered, starts, count = sort_groups(channel, views, size)
+    result = {"views": total,
+              "count": count,
+              "avg_views": np.rint(avg_views),
+              "er": np.round(er, 1),
+              "median_views": np.rint(group_quantile(ordered, starts,
+                                                     count, 0.5)),
+              "trimmed_views": np.rint(group_trimmed_mean(ordered, starts,
+                                                          count)),
+              "p25_views": np.rint(group_quantile(ordered, starts,
+                                                  count, 0.25)),
+              "p75_views": np.rint(group_quantile(ordered, starts,
+                                                  count, 0.75))}
+
+    for name, hours in reach_ages.items():
+        aged = (age >= hours * seconds_in_hour) & \
+               (age < 2 * hours * seconds_in_hour)
+        result[name] = np.rint(group_quantile(
+            *sort_groups(channel[aged], views[aged], size), 0.5))
+    return result
+
+
+def apply(channels: list[Channel], posts: list[list[Post]], days: int):
+    """Функция заполнения метрик охвата и ER каналов цикла.
+    CPM пересчитывается в БД при обновлении каналов
+
+    :param channels:
+        Каналы цикла
+        :type channels: list[Channel]
+    :param posts:
+        Посты каждого канала
+        :type posts: list[list[Post]]
+    :param days:
+        Период в днях
+        :type days: int
+    """
+    if channels == []:
+        return
+    now = int(time.time())
+    members = np.array([item.sub_count for item in channels], dtype=float)
+    result = compute(gather(posts), members, get_cutoff(days, now), now)
+
+    avg_views = result["avg_views"].tolist()
+    er = result["er"].tolist()
+    values = {name: result[name].tolist() for name in reach_fields}
+    for index, item in enumerate(channels):
+        item.avg_coverage = int(avg_views[index])
+        item.er = er[index]
+        for name in reach_fields:
+            setattr(item, name, int(values[name][index]))
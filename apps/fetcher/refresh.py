@@ -0,0 +1,222 @@
+import heapq
+import itertools
+import random
+from dataclasses import dataclass
+
+default_min_interval = 10 * 60
+default_max_interval = 6 * 60 * 60
+activity_weight = 0.5
+velocity_weight = 100
+jitter = 0.1
+seconds_in_hour = 3600
+
+
+@dataclass
+class ChannelState:
+    """Класс состояния обновления канала"""
+    key: int
+    next_at: float
+    refreshed_at: float = None
+    avg_coverage: int = None
+    interval: float = None
+
+
+class RefreshScheduler:
+    """Класс планировщика обновления каналов на очереди с приоритетом.
+    Интервал обновления канала зависит от частоты публикаций и скорости
+    изменения охвата и не превышает max_interval. Просроченные каналы
+    извлекаются в порядке давности
+    """
+    def __init__(self, min_interval: float, max_interval: float):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.heap = []
+        self.states = {}
+        self.counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def push(self, state: ChannelState):
+        """Метод добавления канала в очередь
+
+        :param state:
+            Состояние канала
+            :type state: ChannelState
+        """
+        heapq.heappush(self.heap, (state.next_at, next(self.counter),
+                                   state.key))
+
+    def sync(self, keys, now: float):
+        """Метод синхронизации очереди со списком каналов.
+        Новые каналы обновляются сразу, пропавшие удаляются
+
+        :param keys:
+            ID каналов
+            :type keys: Iterable[int]
+        :param now:
+            Текущее время
+            :type now: float
+        """
+        keys = set(keys)
+        for key in list(self.states):
+            if key not in keys:
+                del self.states[key]
+        for key in keys:
+            if key not in self.states:
+                state = ChannelState(key=key, next_at=now)
+                self.states[key] = state
+                self.push(state)
+
+    def pop_due(self, now: float, limit: int) -> list[int]:
+        """Метод извлечения каналов, которые пора обновить
+
+        :param now:
+            Текущее время
+            :type now: float
+        :param limit:
+            Максимальное число каналов
+            :type limit: int
+        :return: ID каналов
+        :rtype: list[int]
+        """
+        due = []
+        while self.heap and len(due) < limit:
+            next_at, _, key = self.heap[0]
+            state = self.states.get(key)
+            if state is None or state.next_at != next_at:
+                heapq.heappop(self.heap)
+                continue
+            if next_at > now:
+                break
+            heapq.heappop(self.heap)
+            due.append(key)
+        return due
+
+    def next_due(self) -> float:
+        """Метод получения времени ближайшего обновления
+
+        :return: Время ближайшего обновления или None для пустой очереди
+        :rtype: float
+        """
+        while self.heap:
+            next_at, _, key = self.heap[0]
+            state = self.states.get(key)
+            if state is not None and state.next_at == next_at:
+                return next_at
+            heapq.heappop(self.heap)
+        return None
+
+    def schedule(self, key: int, at: float):
+        """Метод назначения времени следующего обновления канала
+
+        :param key:
+            ID канала
+            :type key: int
+        :param at:
+            Время обновления
+            :type at: float
+        """
+        state = self.states.get(key)
+        if state is None:
+            return
+        state.next_at = at
+        self.push(state)
+
+    def reschedule(self, key: int, now: float, posts_per_day: float,
+                   avg_coverage: int) -> float:
+        """Метод планирования канала после успешного обновления
+
+        :param key:
+            ID канала
+            :type key: int
+        :param now:
+            Время обновления
+            :type now: float
+        :param posts_per_day:
+            Среднее число публикаций в день
+            :type posts_per_day: float
+        :param avg_coverage:
+            Новый средний охват
+            :type avg_coverage: int
+        :return: Интервал до следующего обновления в секундах
+        :rtype: float
+        """
+        state = self.states.get(key)
+        if state is None:
+            return None
+        velocity = 0.0
+        if state.refreshed_at is not None and state.avg_coverage:
+            hours = max(now - state.refreshed_at, 1) / seconds_in_hour
+            velocity = abs(avg_coverage - state.avg_coverage) / state.avg_coverage / hours # noqa
+
+        interval = self.interval(posts_per_day, velocity)
+        state.refreshed_at = now
+        state.avg_coverage = avg_coverage
+        state.interval = interval
+        self.schedule(key, now + interval)
+        return interval
+
+    def retry(self, key: int, now: float):
+        """Метод повторного планирования канала после ошибки
+
+        :param key:
+            ID канала
+            :type key: int
+        :param now:
+            Текущее время
+            :type now: float
+        """
+        self.schedule(key, now + self.min_interval)
+
+    def postpone(self, key: int, now: float):
+        """Метод откладывания канала, данные которого недоступны
+
+        :param key:
+            ID канала
+            :type key: int
+        :param now:
+            Текущее время
+            :type now: float
+        """
+        self.schedule(key, now + self.max_interval)
+
+    def interval(self, posts_per_day: float, velocity: float) -> float:
+        """Метод расчёта интервала обновления канала.
+        Чем чаще канал публикует посты и быстрее меняется его охват,
+        тем чаще он обновляется
+
+        :param posts_per_day:
+            Среднее число публикаций в день
+            :type posts_per_day: float
+        :param velocity:
+            Относительное изменение охвата в час
+            :type velocity: float
+        :return: Интервал в секундах
+        :rtype: float
+        """
+        activity = 1 + activity_weight * posts_per_day + \
+            velocity_weight * velocity
+        interval = self.max_interval / activity
+        interval *= random.uniform(1 - jitter, 1 + jitter)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+
+def new_scheduler(min_interval: float = default_min_interval,
+                  max_interval: float = default_max_interval
+                  ) -> RefreshScheduler:
+    """Создание нового планировщика обновления каналов
+
+    :param min_interval:
+        Минимальный интервал обновления канала в секундах,
+        defaults to 600
+        :type min_interval: float, optional
+    :param max_interval:
+        Максимальный интервал обновления канала в секундах,
+        defaults to 21600
+        :type max_interval: float, optional
+    :return: Планировщик обновления каналов
+    :rtype: RefreshScheduler
+    """
+    return RefreshScheduler(min_interval=min_interval,
+                            max_interval=max_interval)
@@ -1,12 +1,22 @@
+import base64
+import binascii
+import json
+import math
 from datetime import datetime
 from functools import wraps
+from typing import Callable
+from urllib.parse import urlencode
 from zoneinfo import ZoneInfo
 
-from flask import request
+from flask import Response, make_response, request
+from pkg.cache.cache import Cache
 from pyrogram import Client
 from pyrogram.errors import BadRequest
 
 timezone = ZoneInfo('Europe/Moscow')
+utc = ZoneInfo('UTC')
+
+auth_ttl = 30
 
 
 def auth_required(fn):
@@ -20,14 +30,13 @@ def auth_required(fn):
 
         request_token = request.headers.get('Authorization').split(' ')[-1]
 
-        auth_code = self.user_storage.get_user_by_authcode(request_token)
+        auth_code = authenticate(
+            self.auth_cache, f"user:{request_token}",
+            lambda: self.user_storage.get_user_by_authcode(request_token))
         if auth_code is None:
             return {"error": "no auth"}, 401
 
-        if auth_code.valid_to > datetime.now(timezone):
-            return fn(self, **kwargs)
-        else:
-            return {"error": "no auth"}, 401
+        return fn(self, **kwargs)
 
     return wrapper
 
@@ -45,18 +54,222 @@ def admin_auth_required(fn):
         access_token = request.headers.get('Authorization').split(' ')[-1]
         print(access_token)
 
-        auth_code = self.admin_storage.get_admin_by_token(access_token)
+        auth_code = authenticate(
+            self.auth_cache, f"admin:{access_token}",
+            lambda: self.admin_storage.get_admin_by_token(access_token))
         if auth_code is None:
             return {"error": "no auth"}, 401
 
-        if auth_code.valid_to > datetime.now(timezone):
-            return fn(self, **kwargs)
-        else:
-            return {"error": "no auth"}, 401
+        return fn(self, **kwargs)
 
     return wrapper
 
 
+def authenticate(cache: Cache, key: str, load: Callable):
+    """Функция проверки токена с кэшированием результата.
+    Время жизни записи в кэше не превышает auth_ttl и срок действия
+    токена
+
+    :param cache:
+        Кэш авторизации
+        :type cache: Cache
+    :param key:
+        Ключ токена в кэше
+        :type key: str
+    :param load:
+        Функция получения владельца токена из БД
+        :type load: Callable
+    :return: Пользователь или администратор с действующим токеном
+    :rtype: user.User | admin.Admin
+    """
+    account = cache.get(key)
+    if account is None:
+        account = load()
+        if account is None:
+            return None
+        ttl = (account.valid_to - datetime.now(timezone)).total_seconds()
+        cache.set(key, account, min(auth_ttl, ttl))
+
+    if account.valid_to > datetime.now(timezone):
+        return account
+    return None
+
+
+def encode_cursor(sort: str, value, id: int) -> str:
+    """Функция кодирования курсора пагинации
+
+    :param sort:
+        Поле сортировки
+        :type sort: str
+    :param value:
+        Значение поля сортировки последнего канала страницы
+        :type value: Any
+    :param id:
+        ID последнего канала страницы
+        :type id: int
+    :return: Непрозрачный курсор
+    :rtype: str
+    """
+    data = json.dumps([sort, value, id]).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """Функция декодирования курсора пагинации
+
+    :param cursor:
+        Курсор из запроса
+        :type cursor: str
+    :param sort:
+        Поле сортировки текущего запроса
+        :type sort: str
+    :return: Значение поля сортировки и ID или None, если курсор не валиден
+    :rtype: tuple
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        cursor_sort, value, id = data
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    if cursor_sort != sort or not is_number(value) or \
+            not is_number(id) or not isinstance(id, int):
+        return None
+    return value, id
+
+
+def is_number(value) -> bool:
+    """Функция проверки, что значение из JSON является конечным числом
+
+    :param value:
+        Значение
+        :type value: Any
+    :return: Значение подходит для сравнения с числовым полем
+    :rtype: bool
+    """
+    return isinstance(value, (int, float)) and \
+        not isinstance(value, bool) and math.isfinite(value)
+
+
+def cache_key(prefix: str, args) -> str:
+    """Функция построения ключа кэша по параметрам запроса.
+    Порядок параметров и пустые значения не влияют на ключ
+
+    :param prefix:
+        Префикс ключа
+        :type prefix: str
+    :param args:
+        Параметры запроса
+        :type args: MultiDict
+    :return: Ключ кэша
+    :rtype: str
+    """
+    items = sorted((key, value) for key, value in args.items(multi=True)
+                   if value != "")
+    return f"{prefix}?{urlencode(items)}"
+
+
+def is_not_modified(etag: str, last_modified: datetime) -> bool:
+    """Функция проверки условных заголовков запроса
+    If-None-Match и If-Modified-Since
+
+    :param etag:
+        Текущий ETag ресурса
+        :type etag: str
+    :param last_modified:
+        Время последнего изменения ресурса
+        :type last_modified: datetime
+    :return: Клиент уже имеет актуальную версию ресурса
+    :rtype: bool
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    if since is None or last_modified is None:
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(utc).replace(tzinfo=None)
+    modified = last_modified.astimezone(utc).replace(tzinfo=None,
+                                                     microsecond=0)
+    return modified <= since
+
+
+def versioned_response(data, etag: str, last_modified: datetime,
+                       status: int = 200) -> Response:
+    """Функция построения ответа с заголовками ETag и Last-Modified
+
+    :param data:
+        Тело ответа, None для ответа 304
+        :type data: Any
+    :param etag:
+        ETag ресурса
+        :type etag: str
+    :param last_modified:
+        Время последнего изменения ресурса
+        :type last_modified: datetime
+    :param status:
+        HTTP статус ответа, defaults to 200
+        :type status: int, optional
+    :return: Ответ
+    :rtype: Response
+    """
+    if data is None:
+        response = Response(status=304)
+    else:
+        response = make_response(data, status)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def prefix_pattern(value: str) -> str:
+    """Функция построения шаблона ILIKE для поиска по началу строки
+
+    :param value:
+        Значение параметра запроса
+        :type value: str
+    :return: Шаблон поиска или None, если параметр не передан
+    :rtype: str
+    """
+    if value is None or value == "":
+        return None
+    return value + "%"
+
+
+def listing_filters(args) -> dict:
+    """Функция получения фильтров списка каналов из параметров запроса
+
+    :param args:
+        Параметры запроса
+        :type args: MultiDict
+    :return: Фильтры в формате параметров ChannelStorage.get_all
+    :rtype: dict
+    """
+    return {"min_subcribers": args.get("min_subcribers", None, type=int),
+            "max_subscribers": args.get("max_subcribers", None, type=int),
+            "min_views": args.get("min_views", None, type=int),
+            "max_views": args.get("max_views", None, type=int),
+            "min_er": args.get("min_er", None, type=int),
+            "max_er": args.get("max_er", None, type=int),
+            "min_cost": args.get("min_cost", None, type=int),
+            "max_cost": args.get("max_cost", None, type=int),
+            "tg_link": prefix_pattern(args.get("tg_link", None, type=str)),
+            "name": prefix_pattern(args.get("tg_name", None, type=str)),
+            "category": prefix_pattern(args.get("category", None, type=str)),
+            "min_median_views": args.get("min_median_views", None, type=int),
+            "max_median_views": args.get("max_median_views", None, type=int),
+            "min_trimmed_views": args.get("min_trimmed_views", None, type=int),
+            "max_trimmed_views": args.get("max_trimmed_views", None, type=int),
+            "min_p25_views": args.get("min_p25_views", None, type=int),
+            "max_p25_views": args.get("max_p25_views", None, type=int),
+            "min_p75_views": args.get("min_p75_views", None, type=int),
+            "max_p75_views": args.get("max_p75_views", None, type=int),
+            "min_reach_24h": args.get("min_reach_24h", None, type=int),
+            "max_reach_24h": args.get("max_reach_24h", None, type=int),
+            "min_reach_48h": args.get("min_reach_48h", None, type=int),
+            "max_reach_48h": args.get("max_reach_48h", None, type=int)}
+
+
 def join_to_channel(teleg_client: Client, channel_login: str):
     """Метод подписки телеграм клиента на канал.
     При первом запуске необходимо войти в учётную запись Telegram
@@ -0,0 +1,271 @@
+import csv
+import io
+import json
+import queue
+import re
+from threading import Event, Thread
+from typing import Iterable, Iterator
+
+from internal.channels.channel import Channel
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from pkg.log import logger
+
+xlsx_mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" # noqa
+csv_mimetype = "text/csv; charset=utf-8"
+ndjson_mimetype = "application/x-ndjson"
+
+xlsx_header = ("Название", "Ссылка", "Подписчики", "Средний охват",
+               "ER %", "Цена, руб.", "CPM, руб.")
+
+csv_header = ("id", "username", "name", "tg_link", "tg_id", "category",
+              "sub_count", "avg_coverage", "er", "cpm", "post_price",
+              "photo_path", "median_views", "trimmed_views", "p25_views",
+              "p75_views", "reach_24h", "reach_48h")
+
+channel_invite_prefix = "https://t.me/"
+
+chunk_size = 64 * 1024
+queue_size = 16
+put_timeout = 1
+rows_per_chunk = 500
+
+
+class QueueWriter(io.RawIOBase):
+    """Поток записи, передающий байты читателю через очередь.
+    Используется как файл для сохранения книги, чтобы отдавать архив
+    клиенту по мере его формирования
+    """
+    def __init__(self):
+        self.chunks = queue.Queue(maxsize=queue_size)
+        self.cancelled = Event()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.put(bytes(data))
+        return len(data)
+
+    def put(self, item):
+        """Метод передачи данных читателю.
+        Если читатель отключился, запись прерывается
+
+        :param item:
+            Часть файла, ошибка или None в конце файла
+            :type item: bytes | Exception | None
+        """
+        while True:
+            if self.cancelled.is_set():
+                raise BrokenPipeError("Клиент прервал скачивание файла")
+            try:
+                self.chunks.put(item, timeout=put_timeout)
+                return
+            except queue.Full:
+                continue
+
+
+def channel_link(item: Channel) -> str:
+    """Функция получения полной ссылки на канал
+
+    :param item:
+        Объект канала
+        :type item: Channel
+    :return: Ссылка на канал
+    :rtype: str
+    """
+    if re.findall("t.me/joinchat/", item.tg_link) == []:
+        return channel_invite_prefix + item.tg_link
+    return item.tg_link
+
+
+def close_source(channels: Iterable[Channel]):
+    """Функция закрытия источника каналов.
+    Генератор из хранилища при закрытии освобождает соединение с БД
+
+    :param channels:
+        Каналы для выгрузки
+        :type channels: Iterable[Channel]
+    """
+    close = getattr(channels, "close", None)
+    if close is not None:
+        close()
+
+
+def write_xlsx(channels: Iterable[Channel], output):
+    """Функция записи каналов в EXEL файл.
+    Книга создаётся в режиме write-only, строки не хранятся в памяти,
+    но openpyxl складывает лист во временный файл на диске и пишет
+    архив в output только при сохранении книги
+
+    :param channels:
+        Каналы для выгрузки
+        :type channels: Iterable[Channel]
+    :param output:
+        Файл для записи
+        :type output: BinaryIO
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(xlsx_header)
+    try:
+        for index, item in enumerate(channels):
+            link = WriteOnlyCell(sheet, channel_link(item))
+            link.row, link.column = index + 2, 2
+            link.hyperlink = link.value
+            link.style = 'Hyperlink'
+            sheet.append((item.name,
+                          link,
+                          item.sub_count,
+                          item.avg_coverage,
+                          item.er,
+                          item.post_price,
+                          item.cpm))
+    finally:
+        close_source(channels)
+    workbook.save(output)
+
+
+def stream_xlsx(channels: Iterable[Channel],
+                logger: logger.Logger) -> Iterator[bytes]:
+    """Генератор EXEL файла для потоковой отдачи клиенту.
+    Книга собирается в отдельном потоке и передаётся частями.
+    Первые байты уходят клиенту только после чтения всех строк,
+    так как openpyxl формирует архив при сохранении книги, поэтому
+    для больших выгрузок следует использовать очередь задач
+
+    :param channels:
+        Каналы для выгрузки
+        :type channels: Iterable[Channel]
+    :param logger:
+        Логгер проекта
+        :type logger: logger.Logger
+    :return: Части файла
+    :rtype: Iterator[bytes]
+    """
+    writer = QueueWriter()
+
+    def build():
+        try:
+            output = io.BufferedWriter(writer, buffer_size=chunk_size)
+            write_xlsx(channels, output)
+            output.flush()
+            writer.put(None)
+        except BrokenPipeError:
+            pass
+        except Exception as e:
+            logger.error(f"Ошибка формирования EXEL файла - {e}")
+            try:
+                writer.put(e)
+            except BrokenPipeError:
+                pass
+
+    Thread(target=build, name="xlsx-export", daemon=True).start()
+    try:
+        while True:
+            item = writer.chunks.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        writer.cancelled.set()
+
+
+def stream_csv(channels: Iterable[Channel],
+               logger: logger.Logger) -> Iterator[bytes]:
+    """Генератор CSV файла для потоковой отдачи клиенту.
+    Строки отдаются порциями по rows_per_chunk
+
+    :param channels:
+        Каналы для выгрузки
+        :type channels: Iterable[Channel]
+    :param logger:
+        Логгер проекта
+        :type logger: logger.Logger
+    :return: Части файла
+    :rtype: Iterator[bytes]
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(csv_header)
+    try:
+        for index, item in enumerate(channels, 1):
+            writer.writerow((item.id, item.username, item.name,
+                             item.tg_link, item.tg_id, item.category,
+                             item.sub_count, item.avg_coverage, item.er,
+                             item.cpm, item.post_price, item.photo_path,
+                             item.median_views, item.trimmed_views,
+                             item.p25_views, item.p75_views,
+                             item.reach_24h, item.reach_48h))
+            if index % rows_per_chunk == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+    except Exception as e:
+        logger.error(f"Ошибка формирования CSV файла - {e}")
+        raise
+    finally:
+        close_source(channels)
+
+
+def stream_ndjson(channels: Iterable[Channel],
+                  logger: logger.Logger) -> Iterator[bytes]:
+    """Генератор NDJSON файла для потоковой отдачи клиенту.
+    Каждый канал записывается отдельной строкой JSON
+
+    :param channels:
+        Каналы для выгрузки
+        :type channels: Iterable[Channel]
+    :param logger:
+        Логгер проекта
+        :type logger: logger.Logger
+    :return: Части файла
+    :rtype: Iterator[bytes]
+    """
+    lines = []
+    try:
+        for item in channels:
+            lines.append(json.dumps(item.to_json(), ensure_ascii=False))
+            if len(lines) == rows_per_chunk:
+                yield ("\n".join(lines) + "\n").encode()
+                lines = []
+        if lines != []:
+            yield ("\n".join(lines) + "\n").encode()
+    except Exception as e:
+        logger.error(f"Ошибка формирования NDJSON файла - {e}")
+        raise
+    finally:
+        close_source(channels)
+
+
+formats = {"xlsx": (stream_xlsx, xlsx_mimetype),
+           "csv": (stream_csv, csv_mimetype),
+           "ndjson": (stream_ndjson, ndjson_mimetype)}
+
+
+def write_file(file_format: str, channels: Iterable[Channel], output,
+               logger: logger.Logger):
+    """Функция записи каналов в файл выбранного формата
+
+    :param file_format:
+        Формат файла: xlsx, csv или ndjson
+        :type file_format: str
+    :param channels:
+        Каналы для выгрузки
+        :type channels: Iterable[Channel]
+    :param output:
+        Файл для записи
+        :type output: BinaryIO
+    :param logger:
+        Логгер проекта
+        :type logger: logger.Logger
+    """
+    if file_format == "xlsx":
+        write_xlsx(channels, output)
+        return
+    stream, _ = formats[file_format]
+    for chunk in stream(channels, logger):
+        output.write(chunk)
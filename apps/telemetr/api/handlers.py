@@ -1,22 +1,26 @@
-import re
 from dataclasses import dataclass
-from datetime import datetime
-from io import BytesIO
-from tempfile import NamedTemporaryFile
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-import openpyxl
 from pyrogram.errors import UserNotParticipant
 import toml
 from apps.auth_bot.bot import Auth_bot
-from apps.telemetr.api.additions import admin_auth_required, auth_required
+from apps.telemetr.api import export
+from apps.telemetr.api.additions import (admin_auth_required, auth_required,
+                                         cache_key, decode_cursor,
+                                         encode_cursor, is_not_modified,
+                                         listing_filters, versioned_response)
+from apps.telemetr.api.jobs import JobQueue, status_done, status_failed
 from flask import Flask, Response, jsonify, request, send_file
 from internal.admin import admin
 from internal.categories import category
 from internal.channels import channel
-from internal.postgres.channel import default_limit, default_offset
+from internal.postgres.channel import (default_limit, default_offset,
+                                       default_sort, sort_fields)
+from internal.stats import analytics, stats
 from internal.telegram.client import TelegramClient
 from internal.users import user
+from pkg.cache.cache import Cache
 from pkg.log import logger
 from pyrogram.errors import BadRequest
 from telegram import Update
@@ -27,6 +31,15 @@ tz_info = cfg.get("timezone").get("tz_info")
 
 channel_invite_prefix = "https://t.me/"
 
+version_ttl = 1
+
+default_stats_days = 30
+default_growth_days = 7
+max_stats_days = 365
+default_growth_limit = 10
+max_growth_limit = 100
+max_integer = 2 ** 31 - 1
+
 tz = ZoneInfo(tz_info)
 
 
@@ -40,6 +53,10 @@ class Handler:
     category_storage: category.Storage
     admin_storage: admin.Storage
     auth_bot: Auth_bot
+    cache: Cache
+    export_jobs: JobQueue
+    auth_cache: Cache
+    stats_storage: stats.Storage
 
     def create_routes(self):
 
@@ -49,6 +66,16 @@ class Handler:
                               self.get_channel,
                               methods=["GET"])
 
+        self.app.add_url_rule("/api/v1/channel/<int:id>/stats",
+                              "get_channel_stats",
+                              self.get_channel_stats,
+                              methods=["GET"])
+
+        self.app.add_url_rule("/api/v1/channel/growth",
+                              "get_growth_ranking",
+                              self.get_growth_ranking,
+                              methods=["GET"])
+
         self.app.add_url_rule("/api/v1/channel",
                               "update_channel",
                               self.update_channel,
@@ -93,6 +120,16 @@ class Handler:
                               self.send_channels_data,
                               methods=["GET"])
 
+        self.app.add_url_rule("/api/v1/export",
+                              "create_export",
+                              self.create_export,
+                              methods=["POST"])
+
+        self.app.add_url_rule("/api/v1/export/<string:job_id>",
+                              "get_export",
+                              self.get_export,
+                              methods=["GET"])
+
         self.app.add_url_rule(f"/api/v1/{bot_token}",
                               "webhook",
                               self.webhook,
@@ -160,25 +197,37 @@ class Handler:
         if id_list is None or id_list == []:
             return {"error": "Bad request"}, 400
 
-        for id in id_list:
-            _channel = self.channel_storage.get_channel_by_id(id)
-            if _channel is None:
-                self.logger.info(f"Канал ID:{id} не существует")
-                if len(id_list) == 1:
-                    return {"error": "not exists"}, 400
-                continue
-
-            if self.channel_storage.delete(id):
-                self.logger.info(f"Удалён канал под ID {id}")
-                try:
-                    self.client.leave_channel(int(_channel.tg_id))
-                except UserNotParticipant:
-                    self.logger.info(f"Канал {_channel.name} уже был покинут клиентом") # noqa
-            else:
-                self.logger.error(f"Канал под ID {id} не удалён")
-                return {"error": "can't remove channel"}, 500
+        try:
+            id_list = [int(id) for id in id_list]
+        except (TypeError, ValueError):
+            return {"error": "Bad request"}, 400
 
-        return {"success": "deleted"}, 200
+        deleted = self.channel_storage.delete_many(id_list)
+        if deleted is None:
+            self.logger.error(f"Каналы под ID {id_list} не удалены")
+            return {"error": "can't remove channel"}, 500
+
+        if deleted == [] and len(id_list) == 1:
+            self.logger.info(f"Канал ID:{id_list[0]} не существует")
+            return {"error": "not exists"}, 400
+
+        tg_ids = {id: int(tg_id) for id, tg_id in deleted
+                  if tg_id is not None and tg_id.lstrip("-").isdigit()}
+        left = self.client.leave_channels(list(tg_ids.values()))
+
+        statuses = {id: "not exists" for id in id_list}
+        for id, _ in deleted:
+            statuses[id] = "deleted"
+            error = left.get(tg_ids.get(id))
+            if isinstance(error, UserNotParticipant):
+                self.logger.info(f"Канал ID:{id} уже был покинут клиентом") # noqa
+            elif error is not None:
+                self.logger.error(f"Ошибка отписки от канала ID:{id} - {error}") # noqa
+                statuses[id] = "deleted, not left"
+
+        items = [{"id": id, "status": status}
+                 for id, status in statuses.items()]
+        return {"success": "deleted", "items": items}, 200
 
     @auth_required
     def add_channel(self) -> Response:
@@ -256,11 +305,13 @@ class Handler:
         if (data is None) or (data == []):
             return {"error": "wrong json format"}, 400
 
+        prices = {}
+        statuses = {}
         for item in data:
             try:
                 channel_id = int(item.get("id", -1))
                 new_price = int(item.get("post_price", -1))
-            except ValueError:
+            except (ValueError, TypeError, AttributeError):
                 channel_id = -1
                 new_price = -1
 
@@ -269,85 +320,125 @@ class Handler:
                     return {"error": "bad request"}, 400
                 continue
 
-            _channel = channel.Channel(id=channel_id,
-                                       username='',
-                                       name='',
-                                       tg_link='',
-                                       tg_id='',
-                                       category='',
-                                       sub_count=0,
-                                       avg_coverage=0,
-                                       er=0,
-                                       cpm=0,
-                                       post_price=new_price,
-                                       photo_path='')
-
-            if self.channel_storage.update_post_price(_channel):
-                self.logger.info(f"Канал ID:{_channel.id} обновлён")
-            else:
-                self.logger.info(f"Канал ID:{_channel.id} не получилось обновить") # noqa
-        return {"success": "updated"}, 200
+            if (channel_id > max_integer) or (new_price > max_integer):
+                if len(data) == 1:
+                    return {"error": "value out of range"}, 400
+                prices.pop(channel_id, None)
+                statuses[channel_id] = "out of range"
+                continue
+
+            prices[channel_id] = new_price
+            statuses[channel_id] = "not found"
+
+        channels = [channel.Channel(id=channel_id,
+                                    username='',
+                                    name='',
+                                    tg_link='',
+                                    tg_id='',
+                                    category='',
+                                    sub_count=0,
+                                    avg_coverage=0,
+                                    er=0,
+                                    cpm=0,
+                                    post_price=new_price,
+                                    photo_path='')
+                    for channel_id, new_price in prices.items()]
+
+        updated = self.channel_storage.update_post_price(channels)
+        if updated is None:
+            self.logger.error(f"Каналы ID:{list(prices)} не получилось обновить") # noqa
+            return {"error": "can't update channels"}, 500
+
+        for channel_id in updated:
+            statuses[channel_id] = "updated"
+        self.logger.info(f"Обновлены каналы ID:{updated}")
+
+        items = [{"id": channel_id, "status": status}
+                 for channel_id, status in statuses.items()]
+        return {"success": "updated", "items": items}, 200
 
     def send_channels_data(self) -> Response:
-        """Метод отправки EXEL файла пользователю
+        """Метод отправки файла с каналами пользователю.
+        Формат задаётся параметром format: xlsx (по умолчанию), csv или
+        ndjson. Для csv и ndjson поддерживаются фильтры списка каналов
 
         :return: Ответ с готовым файлом
         :rtype: Response
         """
+        params, error = export_params(request.args)
+        if error is not None:
+            return error
+        file_format, id_data, filters, sort = params
 
-        url_params = request.args
+        channels = self.channel_storage.iter_channels_to_doc(id_data,
+                                                             filters,
+                                                             sort)
 
-        id_query = url_params.get("id", None)
-        if id_query is None:
-            return {"error": "empty data"}, 400
-
-        id_data_sorted_set = sorted(set(id_query.split(",")))
-
-        id_data = tuple(id_data_sorted_set)
-
-        channels = self.channel_storage.get_channels_to_doc(id_data)
-
-        if channels is None:
-            return {"error": "channels not found"}, 400
-
-        workbook = openpyxl.Workbook()
-
-        with NamedTemporaryFile() as tmp:
-
-            sheet = workbook.active
-
-            sheet['A1'] = "Название"
-            sheet['B1'] = "Ссылка"
-            sheet['C1'] = "Подписчики"
-            sheet['D1'] = "Средний охват"
-            sheet['E1'] = "ER %"
-            sheet['F1'] = "Цена, руб."
-            sheet['G1'] = "CPM, руб."
+        self.logger.info(f"Запрос на скачивание {file_format} файла с id: {id_data}") # noqa
+        stream, mimetype = export.formats[file_format]
+        cur_date = datetime.now().strftime("%d.%m.%Y")
+        return Response(stream(channels, self.logger),
+                        mimetype=mimetype,
+                        headers={"Content-Disposition":
+                                 f"attachment; filename={cur_date}.{file_format}"}) # noqa
 
-            for index, item in enumerate(channels):
-                link_check = re.findall("t.me/joinchat/", item.tg_link)
-                if link_check == []:
-                    item.tg_link = "https://t.me/" + item.tg_link
-                print(item.tg_link)
-                sheet.append((item.name,
-                             item.tg_link,
-                             item.sub_count,
-                             item.avg_coverage,
-                             item.er,
-                             item.cpm,
-                             item.post_price))
+    def create_export(self) -> Response:
+        """Метод создания задачи выгрузки каналов в файл.
+        Принимает те же параметры, что и /api/v1/doc. Одинаковые запросы
+        к одной версии данных получают одну задачу
 
-                sheet[f"B{index+2}"].hyperlink = item.tg_link
-                sheet[f"B{index+2}"].style = 'Hyperlink'
+        :return: Информация о задаче
+        :rtype: Response
+        """
+        url_params = request.args
+        params, error = export_params(url_params)
+        if error is not None:
+            return error
+        file_format, id_data, filters, sort = params
+
+        version, _ = self.get_channels_version()
+        key = f"{version}:" + cache_key("export", url_params)
+        job = self.export_jobs.submit(
+            key,
+            file_format,
+            lambda: self.channel_storage.iter_channels_to_doc(id_data,
+                                                              filters,
+                                                              sort))
+        self.logger.info(f"Задача выгрузки {job.id} в {file_format} создана") # noqa
+        return job.to_json(), 202
+
+    def get_export(self, job_id: str) -> Response:
+        """Метод получения состояния задачи выгрузки.
+        Если файл готов, он отправляется пользователю. Если файл уже
+        удалён по сроку хранения, возвращается 410 и выгрузку можно
+        поставить в очередь заново
+
+        :param job_id:
+            ID задачи
+            :type job_id: str
+        :return: Информация о задаче или готовый файл
+        :rtype: Response
+        """
+        job = self.export_jobs.get(job_id)
+        if job is None:
+            return {"error": "not found"}, 404
+        if job.status == status_failed:
+            return job.to_json(), 500
+        if job.status != status_done:
+            return job.to_json(), 202
 
-            workbook.save(tmp.name)
+        try:
+            output = open(job.path, "rb")
+        except FileNotFoundError:
+            self.export_jobs.discard(job.id)
+            return {"error": "expired"}, 410
 
-            output = BytesIO(tmp.read())
-        self.logger.info(f"Запрос на скачивание файла с id: {id_data_sorted_set}") # noqa
-        cur_date = datetime.now().strftime("%d.%m.%Y")
+        cur_date = datetime.fromtimestamp(job.created_at).strftime("%d.%m.%Y") # noqa
+        mimetype = export.formats[job.file_format][1]
         return send_file(output,
-                         attachment_filename=f'{cur_date}.xlsx',
-                         as_attachment=True), 200
+                         mimetype=mimetype,
+                         attachment_filename=f"{cur_date}.{job.file_format}",
+                         as_attachment=True)
 
     def get_all_channels(self) -> Response:
         """Метод GET для списка каналов
@@ -356,31 +447,56 @@ class Handler:
         :rtype: Response
         """
         url_params = request.args
+
+        version, updated_at = self.get_channels_version()
+        etag = str(version)
+        if is_not_modified(etag, updated_at):
+            return versioned_response(None, etag, updated_at)
+
+        key = f"{version}:" + cache_key("channels", url_params)
+        res = self.cache.get(key)
+        if res is not None:
+            return versioned_response(res, etag, updated_at)
+
+        sort = url_params.get("sort", default_sort, type=str)
+        if sort.lstrip("-") not in sort_fields:
+            return {"error": "wrong sort field"}, 400
+
+        after = None
+        cursor = url_params.get("cursor", None, type=str)
+        if cursor is not None:
+            after = decode_cursor(cursor, sort)
+            if after is None:
+                return {"error": "wrong cursor"}, 400
+
+        limit = url_params.get("limit", default_limit, type=int)
         channels, total = self.channel_storage.get_all(
-            url_params.get("min_subcribers", 0, type=int),
-            url_params.get("max_subcribers", 9999999999, type=int),
-            url_params.get("min_views", 0, type=int),
-            url_params.get("max_views", 9999999999, type=int),
-            url_params.get("min_er", 0, type=int),
-            url_params.get("max_er", 9999999999, type=int),
-            url_params.get("min_cost", 0, type=int),
-            url_params.get("max_cost", 9999999999, type=int),
-            url_params.get("tg_link", "%%", type=str) + "%",
-            url_params.get("tg_name", "%%", type=str) + "%",
-            url_params.get("category", "%%", type=str) + "%",
-            url_params.get("limit", default_limit, type=int),
-            url_params.get("offset", default_offset, type=int)
+            **listing_filters(url_params),
+            limit=limit,
+            offset=url_params.get("offset", default_offset, type=int),
+            sort=sort,
+            after=after,
+            estimate_total=url_params.get("total", None, type=str) == "estimate" # noqa
         )
 
         channel_res = []
         for item in channels:
             channel_res.append(item.to_json())
 
+        next_cursor = None
+        if channels != [] and len(channels) == limit:
+            last = channels[-1]
+            next_cursor = encode_cursor(sort,
+                                        getattr(last, sort.lstrip("-")),
+                                        last.id)
+
         res = {"count": len(channels),
                "total": total,
                "limit": default_limit,
+               "next_cursor": next_cursor,
                "items": channel_res}
-        return res, 200
+        self.cache.set(key, res)
+        return versioned_response(res, etag, updated_at)
 
     def get_channel(self, id: int) -> Response:
         """Метод GET для информации о канале
@@ -391,23 +507,154 @@ class Handler:
         :return: Информация о канале
         :rtype: JSON
         """
+        version, updated_at = self.get_channels_version()
+        etag = str(version)
+        if is_not_modified(etag, updated_at):
+            return versioned_response(None, etag, updated_at)
+
+        key = f"{version}:channel:{id}"
+        res = self.cache.get(key)
+        if res is not None:
+            return versioned_response(res, etag, updated_at)
+
         res = self.channel_storage.get_channel_by_id(id)
         if res is not None:
-            return res.to_json(), 200
+            res = res.to_json()
+            self.cache.set(key, res)
+            return versioned_response(res, etag, updated_at)
         else:
             return {"error": "not found"}, 404
 
+    def get_channel_stats(self, id: int) -> Response:
+        """Метод GET для динамики канала по истории статистики
+
+        :param id:
+            ID канала в базе
+            :type id: int
+        :return: Ряды и итоговые показатели роста канала
+        :rtype: Response
+        """
+        url_params = request.args
+        days = url_params.get("days", default_stats_days, type=int)
+        window = url_params.get("window", analytics.default_window, type=int)
+        if not (0 < days <= max_stats_days) or window <= 0:
+            return {"error": "bad request"}, 400
+
+        etag, updated_at = self.get_stats_version()
+        if is_not_modified(etag, updated_at):
+            return versioned_response(None, etag, updated_at)
+
+        key = f"{etag}:{id}:" + cache_key("stats", url_params)
+        res = self.cache.get(key)
+        if res is not None:
+            return versioned_response(res, etag, updated_at)
+
+        _channel = self.channel_storage.get_channel_by_id(id)
+        if _channel is None:
+            return {"error": "not found"}, 404
+
+        since = datetime.now(tz) - timedelta(days=days)
+        history = self.stats_storage.get_history(_channel.tg_id, since)
+        res = {"id": id, "days": days}
+        res.update(analytics.channel_trend(history, window))
+        self.cache.set(key, res)
+        return versioned_response(res, etag, updated_at)
+
+    def get_growth_ranking(self) -> Response:
+        """Метод GET для рейтинга самых быстрорастущих каналов
+
+        :return: Каналы с показателями роста за период
+        :rtype: Response
+        """
+        url_params = request.args
+        days = url_params.get("days", default_growth_days, type=int)
+        limit = url_params.get("limit", default_growth_limit, type=int)
+        sort = url_params.get("sort", "sub_growth_pct", type=str)
+        if not (0 < days <= max_stats_days) or \
+                not (0 < limit <= max_growth_limit):
+            return {"error": "bad request"}, 400
+        if sort not in analytics.ranking_keys:
+            return {"error": "wrong sort field"}, 400
+
+        etag, updated_at = self.get_stats_version()
+        if is_not_modified(etag, updated_at):
+            return versioned_response(None, etag, updated_at)
+
+        key = f"{etag}:" + cache_key("growth", url_params)
+        res = self.cache.get(key)
+        if res is not None:
+            return versioned_response(res, etag, updated_at)
+
+        since = datetime.now(tz) - timedelta(days=days)
+        ranking = analytics.growth_ranking(
+            self.stats_storage.get_daily_history(since), limit, sort)
+
+        channels = {item.tg_id: item for item in
+                    self.channel_storage.iter_channels_to_doc(
+                        filters={"tg_ids": [item["tg_id"]
+                                            for item in ranking]})}
+        items = []
+        for item in ranking:
+            _channel = channels.get(item.pop("tg_id"))
+            if _channel is not None:
+                items.append({"channel": _channel.to_json(), **item})
+
+        res = {"count": len(items),
+               "days": days,
+               "sort": sort,
+               "items": items}
+        self.cache.set(key, res)
+        return versioned_response(res, etag, updated_at)
+
+    def get_channels_version(self) -> tuple:
+        """Метод получения версии данных каналов для ETag.
+        Версия кэшируется на короткое время, чтобы не обращаться к БД
+        на каждый запрос
+
+        :return: Номер версии и время последнего изменения
+        :rtype: tuple[int, datetime]
+        """
+        version = self.cache.get("channels_version")
+        if version is None:
+            version = self.channel_storage.get_version()
+            self.cache.set("channels_version", version, version_ttl)
+        return version
+
+    def get_stats_version(self) -> tuple:
+        """Метод получения версии аналитики для ETag.
+        Ответы строятся по истории статистики и каталогу каналов,
+        поэтому версия складывается из версий обоих наборов данных
+
+        :return: ETag и время последнего изменения
+        :rtype: tuple[str, datetime]
+        """
+        version = self.cache.get("channel_stats_version")
+        if version is None:
+            version = self.stats_storage.get_version()
+            self.cache.set("channel_stats_version", version, version_ttl)
+        channels_version, channels_updated_at = self.get_channels_version()
+        stats_version, stats_updated_at = version
+        updated_at = max((item for item in (channels_updated_at,
+                                            stats_updated_at)
+                          if item is not None), default=None)
+        return f"{channels_version}.{stats_version}", updated_at
+
     def get_categories(self) -> Response:
         """Метод GET для информации о категориях
 
         :return: Список категорий в БД
         :rtype: JSON
         """
+        category_res = self.cache.get("categories")
+        if category_res is not None:
+            return jsonify(category_res), 200
+
         category_res = []
         res = self.category_storage.get_all()
         for item in res:
             category_res.append(item.to_json())
 
+        self.cache.set("categories", category_res)
         return jsonify(category_res), 200
 
     def get_user_by_id(self, id: int) -> Response:
@@ -523,7 +770,11 @@ def new_handler(logger: logger.Logger, app: Flask, client: TelegramClient,
                 channel_storage: channel.Storage,
                 category_storage: category.Storage,
                 admin_storage: admin.Storage,
-                auth_bot: Auth_bot) -> Handler:
+                auth_bot: Auth_bot,
+                cache: Cache,
+                export_jobs: JobQueue,
+                auth_cache: Cache,
+                stats_storage: stats.Storage) -> Handler:
     """Метод создания хэндлера
 
     :param logger:
@@ -547,6 +798,18 @@ def new_handler(logger: logger.Logger, app: Flask, client: TelegramClient,
     :param auth_bot:
         Бот авторизации
         :type category_storage: Auth_bot
+    :param cache:
+        Кэш ответов API
+        :type cache: Cache
+    :param export_jobs:
+        Очередь задач выгрузки файлов
+        :type export_jobs: JobQueue
+    :param auth_cache:
+        Кэш авторизации пользователей и администраторов
+        :type auth_cache: Cache
+    :param stats_storage:
+        Хранилище истории статистики каналов
+        :type stats_storage: stats.Storage
     :rtype: Handler
     """
     return Handler(
@@ -557,5 +820,45 @@ def new_handler(logger: logger.Logger, app: Flask, client: TelegramClient,
         channel_storage=channel_storage,
         category_storage=category_storage,
         admin_storage=admin_storage,
-        auth_bot=auth_bot
+        auth_bot=auth_bot,
+        cache=cache,
+        export_jobs=export_jobs,
+        auth_cache=auth_cache,
+        stats_storage=stats_storage
     )
+
+
+def export_params(url_params) -> tuple:
+    """Функция разбора параметров выгрузки каналов в файл
+
+    :param url_params:
+        Параметры запроса
+        :type url_params: MultiDict
+    :return: Формат, ID каналов, фильтры и сортировка или ответ с ошибкой
+    :rtype: tuple[tuple, Response]
+    """
+    file_format = url_params.get("format", "xlsx", type=str)
+    if file_format not in export.formats:
+        return None, ({"error": "wrong format"}, 400)
+
+    sort = url_params.get("sort", default_sort, type=str)
+    if sort.lstrip("-") not in sort_fields:
+        return None, ({"error": "wrong sort field"}, 400)
+
+    id_data = None
+    id_query = url_params.get("id", None)
+    if id_query is not None:
+        try:
+            id_data = tuple(sorted({int(item)
+                                    for item in id_query.split(",")}))
+        except ValueError:
+            return None, ({"error": "bad request"}, 400)
+
+    filters = None
+    if file_format == "xlsx":
+        if id_data is None:
+            return None, ({"error": "empty data"}, 400)
+    else:
+        filters = listing_filters(url_params)
+
+    return (file_format, id_data, filters, sort), None
@@ -0,0 +1,252 @@
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Iterable, Iterator
+from uuid import uuid4
+
+from apps.telemetr.api import export
+from internal.channels.channel import Channel
+from pkg.log import logger
+
+default_folder = "exports"
+default_workers = 2
+default_ttl = 600
+
+status_queued = "queued"
+status_running = "running"
+status_done = "done"
+status_failed = "failed"
+
+
+@dataclass
+class ExportJob:
+    """Класс задачи выгрузки каналов в файл"""
+    id: str
+    key: str
+    file_format: str
+    status: str = status_queued
+    rows: int = 0
+    path: str = None
+    error: str = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float = None
+
+    def to_json(self) -> dict:
+        """Метод представления объекта в JSON"""
+        return {"id": self.id,
+                "format": self.file_format,
+                "status": self.status,
+                "rows": self.rows,
+                "error": self.error,
+                "created_at": int(self.created_at),
+                "finished_at": (int(self.finished_at)
+                                if self.finished_at is not None else None)}
+
+
+class JobQueue:
+    """Класс очереди задач выгрузки.
+    Файлы собираются в пуле потоков и сохраняются в папку folder,
+    одинаковые запросы в течение ttl секунд получают одну задачу
+    """
+    def __init__(self, logger: logger.Logger, folder: str, workers: int,
+                 ttl: float):
+        self.logger = logger
+        self.folder = os.path.abspath(folder)
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix="export")
+        self.jobs = {}
+        self.keys = {}
+        self.lock = Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def submit(self, key: str, file_format: str,
+               source: Callable[[], Iterable[Channel]]) -> ExportJob:
+        """Метод постановки выгрузки в очередь.
+        Если такая же выгрузка уже выполняется или готова, возвращается
+        существующая задача
+
+        :param key:
+            Ключ запроса для дедупликации
+            :type key: str
+        :param file_format:
+            Формат файла
+            :type file_format: str
+        :param source:
+            Функция получения каналов для выгрузки
+            :type source: Callable[[], Iterable[Channel]]
+        :return: Задача выгрузки
+        :rtype: ExportJob
+        """
+        self.cleanup()
+        with self.lock:
+            job = self.jobs.get(self.keys.get(key))
+            if job is not None and job.status != status_failed and \
+                    not is_missing(job):
+                return job
+            job = ExportJob(id=uuid4().hex, key=key, file_format=file_format)
+            self.jobs[job.id] = job
+            self.keys[key] = job.id
+        self.executor.submit(self.run, job, source)
+        return job
+
+    def get(self, job_id: str) -> ExportJob:
+        """Метод получения задачи по ID.
+        Если задача выполнялась другим процессом, она восстанавливается
+        по готовому файлу
+
+        :param job_id:
+            ID задачи
+            :type job_id: str
+        :return: Задача выгрузки или None
+        :rtype: ExportJob
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        if not job_id.isalnum():
+            return None
+        for path in glob.glob(os.path.join(self.folder, f"{job_id}.*")):
+            file_format = path.rsplit(".", 1)[-1]
+            if file_format not in export.formats:
+                continue
+            modified = os.path.getmtime(path)
+            if time.time() - modified > self.ttl:
+                continue
+            return ExportJob(id=job_id, key="", file_format=file_format,
+                             status=status_done, path=path,
+                             created_at=modified, finished_at=modified)
+        return None
+
+    def discard(self, job_id: str):
+        """Метод удаления задачи, файл которой больше недоступен
+
+        :param job_id:
+            ID задачи
+            :type job_id: str
+        """
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+            if job is not None and self.keys.get(job.key) == job_id:
+                del self.keys[job.key]
+
+    def run(self, job: ExportJob, source: Callable[[], Iterable[Channel]]):
+        """Метод сборки файла задачи.
+        Файл пишется во временный и переименовывается после завершения
+
+        :param job:
+            Задача выгрузки
+            :type job: ExportJob
+        :param source:
+            Функция получения каналов для выгрузки
+            :type source: Callable[[], Iterable[Channel]]
+        """
+        path = os.path.join(self.folder, f"{job.id}.{job.file_format}")
+        tmp_path = path + ".part"
+        job.status = status_running
+        try:
+            with open(tmp_path, "wb") as output:
+                export.write_file(job.file_format,
+                                  counted(source(), job),
+                                  output,
+                                  self.logger)
+            os.replace(tmp_path, path)
+            job.path = path
+            job.status = status_done
+            self.logger.info(f"Выгрузка {job.id} готова, строк: {job.rows}")
+        except Exception as e:
+            job.error = str(e)
+            job.status = status_failed
+            self.logger.error(f"Ошибка выгрузки {job.id} - {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            job.finished_at = time.time()
+
+    def cleanup(self):
+        """Метод удаления задач и файлов с истёкшим временем жизни"""
+        deadline = time.time() - self.ttl
+        with self.lock:
+            expired = [job for job in self.jobs.values()
+                       if job.finished_at is not None
+                       and job.finished_at < deadline]
+            for job in expired:
+                del self.jobs[job.id]
+                if self.keys.get(job.key) == job.id:
+                    del self.keys[job.key]
+            active = {job.id for job in self.jobs.values()
+                      if job.finished_at is None}
+        for path in glob.glob(os.path.join(self.folder, "*")):
+            if os.path.basename(path).split(".", 1)[0] in active:
+                continue
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def shutdown(self):
+        """Метод остановки пула потоков"""
+        self.executor.shutdown(wait=False)
+
+
+def is_missing(job: ExportJob) -> bool:
+    """Функция проверки, что файл готовой задачи уже удалён,
+    например очисткой в другом процессе
+
+    :param job:
+        Задача выгрузки
+        :type job: ExportJob
+    :return: Файл задачи удалён
+    :rtype: bool
+    """
+    return job.status == status_done and not os.path.exists(job.path)
+
+
+def counted(channels: Iterable[Channel],
+            job: ExportJob) -> Iterator[Channel]:
+    """Генератор каналов с подсчётом выгруженных строк в задаче
+
+    :param channels:
+        Каналы для выгрузки
+        :type channels: Iterable[Channel]
+    :param job:
+        Задача выгрузки
+        :type job: ExportJob
+    :return: Каналы для выгрузки
+    :rtype: Iterator[Channel]
+    """
+    try:
+        for item in channels:
+            job.rows += 1
+            yield item
+    finally:
+        export.close_source(channels)
+
+
+def new_queue(logger: logger.Logger, folder: str = default_folder,
+              workers: int = default_workers,
+              ttl: float = default_ttl) -> JobQueue:
+    """Создание новой очереди задач выгрузки
+
+    :param logger:
+        Логгер проекта
+        :type logger: logger.Logger
+    :param folder:
+        Папка для готовых файлов, defaults to "exports"
+        :type folder: str, optional
+    :param workers:
+        Число потоков сборки файлов, defaults to 2
+        :type workers: int, optional
+    :param ttl:
+        Время хранения файлов и дедупликации запросов в секундах,
+        defaults to 600
+        :type ttl: float, optional
+    :return: Очередь задач выгрузки
+    :rtype: JobQueue
+    """
+    return JobQueue(logger=logger, folder=folder, workers=workers, ttl=ttl)
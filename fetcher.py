@@ -4,8 +4,9 @@ import toml
 from pyrogram import Client
 
 from app import db_logger
-from apps.fetcher import fetcher
-from internal.postgres import channel, postgres
+from apps.fetcher import avatars, fetcher, refresh
+from internal.postgres import channel, post, postgres, stats
+from internal.telegram import scheduler
 from internal.telegram.client import TelegramClient
 from pkg.log import filelogger
 
@@ -13,6 +14,22 @@ cfg = toml.load("cfg.toml")
 app_name = cfg.get("client").get("app_name")
 api_id = cfg.get("client").get("api_id")
 api_hash = cfg.get("client").get("api_hash")
+workers = cfg.get("fetcher", {}).get("workers", fetcher.default_workers)
+rate_limit = cfg.get("fetcher", {}).get("rate_limit", scheduler.default_rate)
+burst = cfg.get("fetcher", {}).get("burst", scheduler.default_burst)
+stats_retention = cfg.get("fetcher", {}).get("stats_retention",
+                                             fetcher.default_stats_retention)
+mode = cfg.get("fetcher", {}).get("mode", "adaptive")
+min_interval = cfg.get("fetcher", {}).get("min_interval",
+                                          refresh.default_min_interval)
+max_interval = cfg.get("fetcher", {}).get("max_interval",
+                                          refresh.default_max_interval)
+dialogs_interval = cfg.get("fetcher", {}).get(
+    "dialogs_interval", fetcher.default_dialogs_interval)
+flush_size = cfg.get("fetcher", {}).get("flush_size",
+                                        fetcher.default_flush_size)
+flush_interval = cfg.get("fetcher", {}).get("flush_interval",
+                                            fetcher.default_flush_interval)
 
 
 def configDB(cfg):
@@ -21,7 +38,11 @@ def configDB(cfg):
         user=cfg.get("databases").get("user"),
         password=cfg.get("databases").get("password"),
         host=cfg.get("databases").get("host"),
-        port=cfg.get("databases").get("port")
+        port=cfg.get("databases").get("port"),
+        min_connections=cfg.get("databases").get(
+            "min_connections", postgres.default_min_connections),
+        max_connections=cfg.get("databases").get(
+            "max_connections", postgres.default_max_connections)
     )
     return cfgDB
 
@@ -30,16 +51,28 @@ logger = filelogger.new_logger("fetcher")
 
 cfgDB = configDB(cfg)
 
-_client = Client(app_name, api_id, api_hash)
+_client = Client(app_name, api_id, api_hash, no_updates=True)
 
 client = TelegramClient(_client)
 
+request_scheduler = scheduler.new_scheduler(logger, rate_limit, burst)
+
 db = postgres.new(cfg=cfgDB, logger=logger)
 channel_storage = channel.new_storage(db=db, logger=db_logger)
+post_storage = post.new_storage(db=db, logger=db_logger)
+stats_storage = stats.new_storage(db=db, logger=db_logger)
+avatar_cache = avatars.new_cache(logger, fetcher.channel_img_folder)
+refresh_scheduler = refresh.new_scheduler(min_interval, max_interval)
 
-fetcher = fetcher.Fetcher(logger, client, channel_storage)
+fetcher = fetcher.Fetcher(logger, client, channel_storage, post_storage,
+                          stats_storage, request_scheduler, avatar_cache,
+                          workers, stats_retention, flush_size,
+                          flush_interval)
 
 if __name__ == "__main__":
-    while True:
-        fetcher.fetch()
-        time.sleep(60 * 30)
+    if mode == "interval":
+        while True:
+            fetcher.fetch()
+            time.sleep(60 * 30)
+    else:
+        fetcher.watch(refresh_scheduler, dialogs_interval)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from typing import Iterator
 
 
 @dataclass
@@ -17,6 +18,12 @@ class Channel:
     cpm: int
     post_price: int
     photo_path: str
+    median_views: int = 0
+    trimmed_views: int = 0
+    p25_views: int = 0
+    p75_views: int = 0
+    reach_24h: int = 0
+    reach_48h: int = 0
 
     def to_json(self) -> dict:
         """Метод представления объекта в JSON"""
@@ -31,7 +38,13 @@ class Channel:
                 "er": self.er,
                 "cpm": self.cpm,
                 "post_price": self.post_price,
-                "photo_path": self.photo_path
+                "photo_path": self.photo_path,
+                "median_views": self.median_views,
+                "trimmed_views": self.trimmed_views,
+                "p25_views": self.p25_views,
+                "p75_views": self.p75_views,
+                "reach_24h": self.reach_24h,
+                "reach_48h": self.reach_48h
                 }
 
 
@@ -60,54 +73,120 @@ class Storage(ABC):
 
     @abstractmethod
     def get_all(self,
-                min_subcribers: int = 0,
-                max_subscribers: int = 9999999999,
-                min_views: int = 0,
-                max_views: int = 9999999999,
-                min_er: int = 0,
-                max_er: int = 9999999999,
-                min_cost: int = 0,
-                max_cost: int = 9999999999,
-                tg_link: str = "%%",
-                name: str = "%%",
-                category: str = "%%",
+                min_subcribers: int = None,
+                max_subscribers: int = None,
+                min_views: int = None,
+                max_views: int = None,
+                min_er: int = None,
+                max_er: int = None,
+                min_cost: int = None,
+                max_cost: int = None,
+                tg_link: str = None,
+                name: str = None,
+                category: str = None,
+                min_median_views: int = None,
+                max_median_views: int = None,
+                min_trimmed_views: int = None,
+                max_trimmed_views: int = None,
+                min_p25_views: int = None,
+                max_p25_views: int = None,
+                min_p75_views: int = None,
+                max_p75_views: int = None,
+                min_reach_24h: int = None,
+                max_reach_24h: int = None,
+                min_reach_48h: int = None,
+                max_reach_48h: int = None,
                 limit: int = 15,
-                offset: int = 0) -> list[Channel]:
+                offset: int = 0,
+                sort: str = "id",
+                after: tuple = None,
+                estimate_total: bool = False) -> list[Channel]:
         """Метод получения списка каналов из БД с параметрами фильтрации
 
         :param min_subcribers:
-            Минимальное число подписчиков на канале, defaults: 0
+            Минимальное число подписчиков на канале, defaults to None
             :type min_subcribers: int, optional
         :param max_subscribers:
-            Максимальное число подписчиков на канале, default: 9999999999
+            Максимальное число подписчиков на канале, defaults to None
             :type max_subscribers: int, optional
         :param min_views:
-            Минимальное число просмотров на канале, default: 0
+            Минимальное число просмотров на канале, defaults to None
             :type min_views: int, optional
         :param max_views:
-            Максимальное число просмотров на канале, default: 9999999999
+            Максимальное число просмотров на канале, defaults to None
             :type max_views: int, optional
         :param min_er:
-            Минимальное параметр ER на канале, default: 0
+            Минимальное параметр ER на канале, defaults to None
             :type min_er: int, optional
         :param max_er:
-            Максимальный параметр ER на канале, default: 9999999999
+            Максимальный параметр ER на канале, defaults to None
             :type max_er: int, optional
         :param min_cost:
-            Минимальное значение стоймости просмотора на канале, default: 0
+            Минимальное значение стоймости просмотора на канале,
+            defaults to None
             :type min_cost: int, optional
         :param max_cost:
             Максимальное значение стоймости просмотора на канале,
-            default: 9999999999
+            defaults to None
             :type max_cost: int, optional
         :param tg_link:
-            Ссылка на телеграмм канал без @, defaults to "%%"
+            Ссылка на телеграмм канал без @, defaults to None
             :type tg_link: str, optional
         :param name:
-            Имя канала, defaults to "%%"
+            Имя канала, defaults to None
             :type name: str, optional
-        :return: Список каналов
-        :rtype: list[Channel]
+        :param category:
+            Категория канала, defaults to None
+            :type category: str, optional
+        :param min_median_views:
+            Минимальная медиана просмотров поста, defaults to None
+            :type min_median_views: int, optional
+        :param max_median_views:
+            Максимальная медиана просмотров поста, defaults to None
+            :type max_median_views: int, optional
+        :param min_trimmed_views:
+            Минимальное усечённое на 10% среднее просмотров, defaults to None
+            :type min_trimmed_views: int, optional
+        :param max_trimmed_views:
+            Максимальное усечённое на 10% среднее просмотров, defaults to None
+            :type max_trimmed_views: int, optional
+        :param min_p25_views:
+            Минимальный 25-й перцентиль просмотров поста, defaults to None
+            :type min_p25_views: int, optional
+        :param max_p25_views:
+            Максимальный 25-й перцентиль просмотров поста, defaults to None
+            :type max_p25_views: int, optional
+        :param min_p75_views:
+            Минимальный 75-й перцентиль просмотров поста, defaults to None
+            :type min_p75_views: int, optional
+        :param max_p75_views:
+            Максимальный 75-й перцентиль просмотров поста, defaults to None
+            :type max_p75_views: int, optional
+        :param min_reach_24h:
+            Минимальный охват поста к 24 часам, defaults to None
+            :type min_reach_24h: int, optional
+        :param max_reach_24h:
+            Максимальный охват поста к 24 часам, defaults to None
+            :type max_reach_24h: int, optional
+        :param min_reach_48h:
+            Минимальный охват поста к 48 часам, defaults to None
+            :type min_reach_48h: int, optional
+        :param max_reach_48h:
+            Максимальный охват поста к 48 часам, defaults to None
+            :type max_reach_48h: int, optional
+        :param sort:
+            Поле сортировки, с префиксом "-" по убыванию, defaults to "id"
+            :type sort: str, optional
+        :param after:
+            Ключ сортировки и ID последнего канала предыдущей страницы.
+            Если передан, offset не используется, defaults to None
+            :type after: tuple, optional
+        :param estimate_total:
+            Оценивать общее число каналов по статистике планировщика.
+            Применяется только без фильтров, defaults to False
+            :type estimate_total: bool, optional
+        :return: Список каналов и их общее число
+        :rtype: tuple[list[Channel], int]
         """
         pass
 
@@ -122,22 +201,50 @@ class Storage(ABC):
         pass
 
     @abstractmethod
-    def update_post_price(self, channel: Channel):
-        """Метод обновления цены данных за пост
+    def update_many_from_fetcher(self, channels: list[Channel]) -> dict:
+        """Метод обновления данных списка каналов из Телеграм клиента
 
-        :param channel:
-            Объект канала
-            :type channel: Channel
+        :param channels:
+            Список объектов каналов
+            :type channels: list[Channel]
+        :return: Пересчитанный CPM обновлённых каналов по Telegram ID
+        :rtype: dict[str, int]
+        """
+        pass
+
+    @abstractmethod
+    def update_post_price(self, channels: list[Channel]) -> list[int]:
+        """Метод обновления цены за пост списка каналов
+
+        :param channels:
+            Объекты каналов с ID и новой ценой
+            :type channels: list[Channel]
+        :return: ID обновлённых каналов
+        :rtype: list[int]
         """
         pass
 
     @abstractmethod
-    def get_channels_to_doc(self, id_data: tuple):
-        """Метод получения каналов, необходимых для добавления в EXEL файл
+    def iter_channels_to_doc(self, id_data: tuple = None,
+                             filters: dict = None,
+                             sort: str = "id",
+                             chunk_size: int = 2000) -> Iterator[Channel]:
+        """Генератор каналов для выгрузки в файл
 
-        :param
-            id_data: ID каналов, которые нужно выгрузить
-            :type id_data: tuple
+        :param id_data:
+            ID каналов, которые нужно выгрузить, defaults to None
+            :type id_data: tuple, optional
+        :param filters:
+            Фильтры в формате параметров get_all, defaults to None
+            :type filters: dict, optional
+        :param sort:
+            Поле сортировки, с префиксом "-" по убыванию, defaults to "id"
+            :type sort: str, optional
+        :param chunk_size:
+            Количество строк, получаемых за один запрос к БД
+            :type chunk_size: int, optional
+        :return: Каналы из БД
+        :rtype: Iterator[Channel]
         """
         pass
 
@@ -151,6 +258,36 @@ class Storage(ABC):
         """
         pass
 
+    @abstractmethod
+    def delete_many(self, id_list: list[int]) -> list[tuple]:
+        """Метод удаления списка каналов
+
+        :param id_list:
+            ID каналов
+            :type id_list: list[int]
+        :return: ID и Telegram ID удалённых каналов
+        :rtype: list[tuple[int, str]]
+        """
+        pass
+
     @abstractmethod
     def get_channel_by_teleg_id(self, id: str):
         pass
+
+    @abstractmethod
+    def get_photo_paths(self) -> set[str]:
+        """Метод получения путей к аватарам всех каналов
+
+        :return: Пути к аватарам
+        :rtype: set[str]
+        """
+        pass
+
+    @abstractmethod
+    def get_version(self) -> tuple:
+        """Метод получения версии данных каналов
+
+        :return: Номер версии и время последнего изменения
+        :rtype: tuple[int, datetime]
+        """
+        pass
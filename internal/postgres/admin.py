@@ -9,6 +9,7 @@ from dataclasses import dataclass
 
 from internal.admin import admin
 from internal.postgres import postgres
+from pkg.cache.cache import Cache
 
 cfg = toml.load("cfg.toml")
 tz_info = cfg.get("timezone").get("tz_info")
@@ -26,6 +27,7 @@ class AdminStorage(admin.Storage):
     """Реализация абстрактного класса администратора"""
 
     db: postgres.DB
+    auth_cache: Cache = None
 
     get_admin_query = f"SELECT {admin_fields} FROM admin \
                                 WHERE username = %s ORDER BY id"
@@ -42,13 +44,14 @@ class AdminStorage(admin.Storage):
         :return: Пользователя с токен
         :rtype: admin.Admin
         """
-        cursor = self.db.session.cursor()
-        cursor.execute(self.get_admin_query, (username, ))
-        row = cursor.fetchone()
-        if row is None:
-            return None
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_admin_query, (username, ))
+            row = cursor.fetchone()
+            if row is None:
+                return None
 
-        return scan_admin(row)
+            return scan_admin(row)
 
     def update_token(self, admin: admin.Admin) -> str:
         """Метод обновления токена
@@ -59,21 +62,25 @@ class AdminStorage(admin.Storage):
         :return: Результат вставки
         :rtype: bool
         """
-        try:
-            created_at = datetime.now(tz)
-            valid_to = created_at + timedelta(hours=1)
-            print(f"{created_at}, {valid_to} LESS? {created_at < valid_to}")
-            access_token = str(uuid4())
-            cursor = self.db.session.cursor()
-            cursor.execute(self.update_access_token_query, (access_token,
-                                                            created_at,
-                                                            valid_to,
-                                                            admin.username))
-            self.db.session.commit()
-            return access_token
-        except IntegrityError:
-            self.db.session.rollback()
-            return None
+        with self.db.connection() as conn:
+            try:
+                created_at = datetime.now(tz)
+                valid_to = created_at + timedelta(hours=1)
+                print(f"{created_at}, {valid_to} LESS? {created_at < valid_to}") # noqa
+                access_token = str(uuid4())
+                cursor = conn.cursor()
+                cursor.execute(self.update_access_token_query,
+                               (access_token,
+                                created_at,
+                                valid_to,
+                                admin.username))
+                conn.commit()
+                if self.auth_cache is not None:
+                    self.auth_cache.clear()
+                return access_token
+            except IntegrityError:
+                conn.rollback()
+                return None
 
     def get_admin_by_token(self, access_token: str) -> admin.Admin:
         """Метод проверки авторизации администратора
@@ -83,13 +90,14 @@ class AdminStorage(admin.Storage):
         :return: Администратора с токеном
         :rtype: admin.Admin
         """
-        cursor = self.db.session.cursor()
-        cursor.execute(self.get_admin_by_token_query, (access_token, ))
-        row = cursor.fetchone()
-        if row is not None:
-            return scan_admin(row)
-        else:
-            return None
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_admin_by_token_query, (access_token, ))
+            row = cursor.fetchone()
+            if row is not None:
+                return scan_admin(row)
+            else:
+                return None
 
 
 def scan_admin(data: tuple) -> admin.Admin:
@@ -128,13 +136,16 @@ def scan_admins(data: list[tuple]) -> list[admin.Admin]:
     return admins
 
 
-def new_storage(db: postgres.DB) -> AdminStorage:
+def new_storage(db: postgres.DB, auth_cache: Cache = None) -> AdminStorage:
     """Функция инициализации хранилища категорий
 
     :param db:
         объект базы данных
         :type db: postgres.DB
+    :param auth_cache:
+        кэш авторизации, сбрасываемый при смене токена
+        :type auth_cache: Cache, optional
     :return: объект хранилища категорий
     :rtype: Category
     """
-    return AdminStorage(db=db)
+    return AdminStorage(db=db, auth_cache=auth_cache)
@@ -2,6 +2,7 @@ from dataclasses import dataclass
 
 from internal.categories import category
 from internal.postgres import postgres
+from pkg.cache.cache import Cache
 from pkg.log import logger
 from psycopg2 import IntegrityError
 
@@ -14,6 +15,7 @@ class CategoryStorage(category.Storage):
 
     db: postgres.DB
     logger: logger.Logger
+    cache: Cache = None
 
     get_categories_query = "SELECT name FROM categories ORDER BY name"
 
@@ -26,12 +28,13 @@ class CategoryStorage(category.Storage):
         :return: Категории из БД
         :rtype: list[Category]
         """
-        cursor = self.db.session.cursor()
-        cursor.execute(self.get_categories_query)
-        row = cursor.fetchall()
-        ch_list = scan_categories(row)
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_categories_query)
+            row = cursor.fetchall()
+            ch_list = scan_categories(row)
 
-        return ch_list
+            return ch_list
 
     def insert(self, category: category.Category) -> bool:
         """Метод добавления новой категории в БД
@@ -42,16 +45,19 @@ class CategoryStorage(category.Storage):
         :return: Результат вставки
         :rtype: bool
         """
-        try:
-            cursor = self.db.session.cursor()
-            cursor.execute(self.insert_category_query, (category.name, ))
-            self.db.session.commit()
-            self.logger.info(f"Добавлена категория: {category.name}")
-            return True
-        except IntegrityError:
-            self.db.session.rollback()
-            self.logger.error(f"Ошибка при добавлении категории {category.name}. Такая категория уже существует") # noqa
-            return False
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(self.insert_category_query, (category.name, ))
+                conn.commit()
+                if self.cache is not None:
+                    self.cache.clear()
+                self.logger.info(f"Добавлена категория: {category.name}")
+                return True
+            except IntegrityError:
+                conn.rollback()
+                self.logger.error(f"Ошибка при добавлении категории {category.name}. Такая категория уже существует") # noqa
+                return False
 
 
 def scan_category(data: tuple) -> category.Category:
@@ -85,13 +91,17 @@ def scan_categories(data: list[tuple]) -> list[category.Category]:
     return categories
 
 
-def new_storage(db: postgres.DB, logger: logger.Logger) -> CategoryStorage:
+def new_storage(db: postgres.DB, logger: logger.Logger,
+                cache: Cache = None) -> CategoryStorage:
     """Функция инициализации хранилища категорий
 
     :param db:
         объект базы данных
         :type db: postgres.DB
+    :param cache:
+        кэш ответов API, сбрасываемый при добавлении категории
+        :type cache: Cache, optional
     :return: объект хранилища категорий
     :rtype: Category
     """
-    return CategoryStorage(db=db, logger=logger)
+    return CategoryStorage(db=db, logger=logger, cache=cache)
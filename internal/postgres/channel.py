@@ -1,30 +1,66 @@
 from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterator
+from uuid import uuid4
 
 from internal.channels import channel
 from internal.postgres import postgres
+from pkg.cache.cache import Cache
 from pkg.log import logger
 from psycopg2 import IntegrityError
+from psycopg2.extras import execute_values
 
 insert_channel_fields = "owner, name, " + \
                         "tg_link, tg_id, category, sub_count, " + \
                         "avg_coverage, er, cpm, post_price, photo_path"
 
-select_all_channel_fields = "id, " + insert_channel_fields
+reach_channel_fields = "median_views, trimmed_views, p25_views, " + \
+                       "p75_views, reach_24h, reach_48h"
+
+select_all_channel_fields = "id, " + insert_channel_fields + ", " + \
+                            reach_channel_fields
 
 
 default_limit = 5
 default_offset = 0
+default_sort = "id"
+default_chunk_size = 2000
+
+sort_fields = ("id", "sub_count", "avg_coverage", "er", "cpm", "post_price",
+               "median_views", "trimmed_views", "p25_views", "p75_views",
+               "reach_24h", "reach_48h")
+
+channel_filters = {
+    "min_subcribers": "(sub_count >= %s)",
+    "max_subscribers": "(sub_count <= %s)",
+    "min_views": "(avg_coverage >= %s)",
+    "max_views": "(avg_coverage <= %s)",
+    "min_er": "(er >= %s)",
+    "max_er": "(er <= %s)",
+    "min_cost": "(post_price >= %s)",
+    "max_cost": "(post_price <= %s)",
+    "tg_link": "(tg_link ILIKE %s)",
+    "name": "(name ILIKE %s)",
+    "category": "(category ILIKE %s)",
+    "min_median_views": "(median_views >= %s)",
+    "max_median_views": "(median_views <= %s)",
+    "min_trimmed_views": "(trimmed_views >= %s)",
+    "max_trimmed_views": "(trimmed_views <= %s)",
+    "min_p25_views": "(p25_views >= %s)",
+    "max_p25_views": "(p25_views <= %s)",
+    "min_p75_views": "(p75_views >= %s)",
+    "max_p75_views": "(p75_views <= %s)",
+    "min_reach_24h": "(reach_24h >= %s)",
+    "max_reach_24h": "(reach_24h <= %s)",
+    "min_reach_48h": "(reach_48h >= %s)",
+    "max_reach_48h": "(reach_48h <= %s)",
+    "ids": "(id = ANY(%s))",
+    "tg_ids": "(tg_id = ANY(%s))",
+}
 
-er_range = "(er between %s and %s)"
-avg_coverage_range = "(avg_coverage between %s and %s)"
-cpm_range = "(cpm between %s and %s)"
-sub_count_range = "(sub_count between %s and %s)"
-post_price_range = "(post_price between %s and %s)"
-tg_link_search = "(tg_link ILIKE %s)"
-tg_name_search = "(name ILIKE %s)"
-category_search = "(category ILIKE %s)"
 limit_value = "%s"
 offset_value = "%s"
+order_by = "{sort} {direction}, id {direction}"
 
 
 @dataclass
@@ -33,136 +69,297 @@ class ChannelStorage(channel.Storage):
 
     db: postgres.DB
     logger: logger.Logger
-
-    get_channels_query = f"SELECT {select_all_channel_fields} FROM channels \
-                          WHERE {sub_count_range} AND \
-                          {avg_coverage_range} AND \
-                          {er_range} AND \
-                          {post_price_range} AND \
-                          {tg_link_search} AND \
-                          {tg_name_search} AND \
-                          {category_search} \
-                          ORDER BY id \
+    cache: Cache = None
+
+    get_channels_query = f"SELECT filtered.* FROM ( \
+                          SELECT COUNT(*) OVER () AS count, \
+                          {select_all_channel_fields} FROM channels \
+                          WHERE {{where}}) AS filtered \
+                          WHERE {{seek}} \
+                          ORDER BY {{order}} \
                           LIMIT {limit_value} \
                           OFFSET {offset_value}"
 
-    get_rows_query = f"SELECT COUNT(*) FROM channels \
-                      WHERE {sub_count_range} AND \
-                      {avg_coverage_range} AND \
-                      {er_range} AND \
-                      {post_price_range} AND \
-                      {tg_link_search} AND \
-                      {tg_name_search} AND \
-                      {category_search}"
+    get_channels_count_query = "SELECT COUNT(*) FROM channels \
+                                WHERE {where}"
+
+    get_channels_export_query = f"SELECT {select_all_channel_fields} \
+                                 FROM channels \
+                                 WHERE {{where}} \
+                                 ORDER BY {{order}}"
+
+    get_channels_estimate_query = f"SELECT total.count, page.* \
+                                   FROM (SELECT \
+                                   GREATEST(reltuples, 0)::bigint \
+                                   FROM pg_class \
+                                   WHERE oid = 'channels'::regclass) \
+                                   AS total (count) \
+                                   LEFT JOIN LATERAL ( \
+                                   SELECT {select_all_channel_fields} \
+                                   FROM channels \
+                                   WHERE {{seek}} \
+                                   ORDER BY {{order}} \
+                                   LIMIT {limit_value} \
+                                   OFFSET {offset_value}) AS page ON TRUE \
+                                   ORDER BY {{order}}"
 
     get_channel_by_id_query = f"SELECT {select_all_channel_fields} \
                                FROM channels WHERE id = %s"
 
-    get_channels_in_range_query = f"SELECT {select_all_channel_fields} \
-                                    FROM channels WHERE id IN %s ORDER BY id"
-
-    update_channel_fields_query = "UPDATE channels SET sub_count=%s, \
-                                   avg_coverage=%s, er=%s, photo_path=%s, \
-                                   tg_link=%s, cpm=%s \
+    update_channel_fields_query = "UPDATE channels \
+                                   SET sub_count=COALESCE(%s, 0), \
+                                   avg_coverage=COALESCE(%s, 0), er=%s, \
+                                   photo_path=%s, tg_link=%s, cpm=%s \
                                    WHERE tg_id=%s RETURNING id"
 
-    update_post_price_query = "UPDATE channels SET post_price=%s \
-                              WHERE id = %s RETURNING ID"
+    update_many_from_fetcher_query = "UPDATE channels SET \
+                                      sub_count=COALESCE( \
+                                      data.sub_count, 0), \
+                                      avg_coverage=COALESCE( \
+                                      data.avg_coverage, 0), \
+                                      er=data.er, \
+                                      photo_path=data.photo_path, \
+                                      tg_link=data.tg_link, \
+                                      median_views=data.median_views, \
+                                      trimmed_views=data.trimmed_views, \
+                                      p25_views=data.p25_views, \
+                                      p75_views=data.p75_views, \
+                                      reach_24h=data.reach_24h, \
+                                      reach_48h=data.reach_48h, \
+                                      cpm=CASE WHEN data.avg_coverage > 0 \
+                                      THEN ROUND( \
+                                      COALESCE(channels.post_price, 0) \
+                                      * 1000.0 / data.avg_coverage) \
+                                      ELSE 0 END \
+                                      FROM (VALUES %s) AS data (sub_count, \
+                                      avg_coverage, er, photo_path, tg_link, \
+                                      median_views, trimmed_views, \
+                                      p25_views, p75_views, reach_24h, \
+                                      reach_48h, tg_id) \
+                                      WHERE channels.tg_id = data.tg_id \
+                                      RETURNING channels.tg_id, channels.cpm"
+
+    update_many_from_fetcher_template = "(%s::integer, %s::integer, \
+                                         %s::numeric, %s::text, %s::text, \
+                                         %s::integer, %s::integer, \
+                                         %s::integer, %s::integer, \
+                                         %s::integer, %s::integer, \
+                                         %s::text)"
+
+    update_post_price_query = "UPDATE channels SET \
+                               post_price=data.post_price, \
+                               cpm=CASE WHEN channels.avg_coverage > 0 \
+                               THEN ROUND(data.post_price * 1000.0 \
+                               / channels.avg_coverage) \
+                               ELSE 0 END \
+                               FROM (VALUES %s) AS data (id, post_price) \
+                               WHERE channels.id = data.id \
+                               RETURNING channels.id"
+
+    update_post_price_template = "(%s::integer, %s::integer)"
 
     insert_channel_query = "INSERT INTO channels (" + insert_channel_fields + " ) \
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)" # noqa
+                            VALUES (%s, %s, %s, %s, %s, COALESCE(%s, 0), \
+                            COALESCE(%s, 0), %s, %s, COALESCE(%s, 0), %s)"
 
     get_user_channels_query = f"SELECT {select_all_channel_fields} FROM channels \
                               WHERE owner = %s"
 
     delete_channel_query = "DELETE FROM channels WHERE id=%s RETURNING ID"
 
+    delete_channels_query = "DELETE FROM channels WHERE id = ANY(%s) \
+                             RETURNING id, tg_id"
+
     get_channel_by_teleg_id_query = f"SELECT {select_all_channel_fields} \
                                      FROM channels WHERE tg_id = %s"
 
+    get_photo_paths_query = "SELECT DISTINCT photo_path FROM channels \
+                             WHERE photo_path <> ''"
+
+    get_version_query = "SELECT version, updated_at FROM dataset_versions \
+                         WHERE name = 'channels'"
+
+    def invalidate_cache(self):
+        """Метод сброса кэша ответов после изменения данных каналов"""
+        if self.cache is not None:
+            self.cache.clear()
+
     def get_all(self,
-                min_subcribers=0,
-                max_subscribers=9999999999,
-                min_views=0,
-                max_views=9999999999,
-                min_er=0,
-                max_er=9999999999,
-                min_cost=0,
-                max_cost=9999999999,
-                tg_link="%%",
-                name="%%",
-                category="%%",
+                min_subcribers=None,
+                max_subscribers=None,
+                min_views=None,
+                max_views=None,
+                min_er=None,
+                max_er=None,
+                min_cost=None,
+                max_cost=None,
+                tg_link=None,
+                name=None,
+                category=None,
+                min_median_views=None,
+                max_median_views=None,
+                min_trimmed_views=None,
+                max_trimmed_views=None,
+                min_p25_views=None,
+                max_p25_views=None,
+                min_p75_views=None,
+                max_p75_views=None,
+                min_reach_24h=None,
+                max_reach_24h=None,
+                min_reach_48h=None,
+                max_reach_48h=None,
                 limit=default_limit,
-                offset=default_offset) -> list[channel.Channel]:
-        """Метод получения списка каналов из БД с параметрами фильтрации
+                offset=default_offset,
+                sort=default_sort,
+                after=None,
+                estimate_total=False) -> list[channel.Channel]:
+        """Метод получения списка каналов из БД с параметрами фильтрации.
+        Страница и общее число каналов получаются за один проход фильтра,
+        число считается отдельно только для пустой страницы за концом
+        списка
 
         :param min_subcribers:
-            Минимальное число подписчиков на канале, defaults: 0
+            Минимальное число подписчиков на канале, defaults to None
             :type min_subcribers: int, optional
         :param max_subscribers:
-            Максимальное число подписчиков на канале, default: 9999999999
+            Максимальное число подписчиков на канале, defaults to None
             :type max_subscribers: int, optional
         :param min_views:
-            Минимальное число просмотров на канале, default: 0
+            Минимальное число просмотров на канале, defaults to None
             :type min_views: int, optional
         :param max_views:
-            Максимальное число просмотров на канале, default: 9999999999
+            Максимальное число просмотров на канале, defaults to None
             :type max_views: int, optional
         :param min_er:
-            Минимальное параметр ER на канале, default: 0
+            Минимальное параметр ER на канале, defaults to None
             :type min_er: int, optional
         :param max_er:
-            Максимальный параметр ER на канале, default: 9999999999
+            Максимальный параметр ER на канале, defaults to None
             :type max_er: int, optional
         :param min_cost:
-            Минимальное значение стоймости просмотора на канале, default: 0
+            Минимальное значение стоймости просмотора на канале,
+            defaults to None
             :type min_cost: int, optional
         :param max_cost:
             Максимальное значение стоймости просмотора на канале,
-            default: 9999999999
+            defaults to None
             :type max_cost: int, optional
         :param tg_link:
-            Ссылка на телеграмм канал без @, defaults to "%%"
+            Ссылка на телеграмм канал без @, defaults to None
             :type tg_link: str, optional
         :param name:
-            Имя канала, defaults to "%%"
+            Имя канала, defaults to None
             :type name: str, optional
-        :return: Список каналов
-        :rtype: list[Channel]
+        :param category:
+            Категория канала, defaults to None
+            :type category: str, optional
+        :param min_median_views:
+            Минимальная медиана просмотров поста, defaults to None
+            :type min_median_views: int, optional
+        :param max_median_views:
+            Максимальная медиана просмотров поста, defaults to None
+            :type max_median_views: int, optional
+        :param min_trimmed_views:
+            Минимальное усечённое на 10% среднее просмотров, defaults to None
+            :type min_trimmed_views: int, optional
+        :param max_trimmed_views:
+            Максимальное усечённое на 10% среднее просмотров, defaults to None
+            :type max_trimmed_views: int, optional
+        :param min_p25_views:
+            Минимальный 25-й перцентиль просмотров поста, defaults to None
+            :type min_p25_views: int, optional
+        :param max_p25_views:
+            Максимальный 25-й перцентиль просмотров поста, defaults to None
+            :type max_p25_views: int, optional
+        :param min_p75_views:
+            Минимальный 75-й перцентиль просмотров поста, defaults to None
+            :type min_p75_views: int, optional
+        :param max_p75_views:
+            Максимальный 75-й перцентиль просмотров поста, defaults to None
+            :type max_p75_views: int, optional
+        :param min_reach_24h:
+            Минимальный охват поста к 24 часам, defaults to None
+            :type min_reach_24h: int, optional
+        :param max_reach_24h:
+            Максимальный охват поста к 24 часам, defaults to None
+            :type max_reach_24h: int, optional
+        :param min_reach_48h:
+            Минимальный охват поста к 48 часам, defaults to None
+            :type min_reach_48h: int, optional
+        :param max_reach_48h:
+            Максимальный охват поста к 48 часам, defaults to None
+            :type max_reach_48h: int, optional
+        :param sort:
+            Поле сортировки, с префиксом "-" по убыванию, defaults to "id"
+            :type sort: str, optional
+        :param after:
+            Ключ сортировки и ID последнего канала предыдущей страницы.
+            Если передан, offset не используется, defaults to None
+            :type after: tuple, optional
+        :param estimate_total:
+            Оценивать общее число каналов по статистике планировщика.
+            Применяется только без фильтров, defaults to False
+            :type estimate_total: bool, optional
+        :return: Список каналов и их общее число
+        :rtype: tuple[list[Channel], int]
         """
-        cursor = self.db.session.cursor()
-        cursor.execute(self.get_channels_query, (min_subcribers,
-                                                 max_subscribers,
-                                                 min_views,
-                                                 max_views,
-                                                 min_er,
-                                                 max_er,
-                                                 min_cost,
-                                                 max_cost,
-                                                 tg_link,
-                                                 name,
-                                                 category,
-                                                 limit,
-                                                 offset))
-        row = cursor.fetchall()
-        ch_list = scan_channels(row)
-
-        cursor.execute(self.get_rows_query, (min_subcribers,
-                                             max_subscribers,
-                                             min_views,
-                                             max_views,
-                                             min_er,
-                                             max_er,
-                                             min_cost,
-                                             max_cost,
-                                             tg_link,
-                                             name,
-                                             category,
-                                             ))
-
-        total = cursor.fetchone()[0]
-
-        return ch_list, total
+        values = {"min_subcribers": min_subcribers,
+                  "max_subscribers": max_subscribers,
+                  "min_views": min_views,
+                  "max_views": max_views,
+                  "min_er": min_er,
+                  "max_er": max_er,
+                  "min_cost": min_cost,
+                  "max_cost": max_cost,
+                  "tg_link": tg_link,
+                  "name": name,
+                  "category": category,
+                  "min_median_views": min_median_views,
+                  "max_median_views": max_median_views,
+                  "min_trimmed_views": min_trimmed_views,
+                  "max_trimmed_views": max_trimmed_views,
+                  "min_p25_views": min_p25_views,
+                  "max_p25_views": max_p25_views,
+                  "min_p75_views": min_p75_views,
+                  "max_p75_views": max_p75_views,
+                  "min_reach_24h": min_reach_24h,
+                  "max_reach_24h": max_reach_24h,
+                  "min_reach_48h": min_reach_48h,
+                  "max_reach_48h": max_reach_48h}
+        active = tuple(key for key in channel_filters
+                       if values.get(key) is not None)
+        params = tuple(values[key] for key in active)
+
+        seek_values = ()
+        if after is not None:
+            seek_values = seek_params(sort.lstrip("-"), after)
+            offset = 0
+
+        if estimate_total and active == ():
+            query = build_listing_query(self.get_channels_estimate_query,
+                                        active, sort, after is not None)
+        else:
+            query = build_listing_query(self.get_channels_query,
+                                        active, sort, after is not None)
+
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params + seek_values + (limit, offset))
+            row = cursor.fetchall()
+
+            if row != []:
+                total = row[0][0]
+            elif after is None and offset == 0:
+                total = 0
+            else:
+                cursor.execute(build_listing_query(
+                    self.get_channels_count_query, active, sort, False),
+                    params)
+                total = cursor.fetchone()[0]
+            ch_list = scan_channels([item[1:] for item in row
+                                     if item[1] is not None])
+
+            return ch_list, total
 
     def insert(self, channel: channel.Channel) -> bool:
         """Метод добавления канала в БД
@@ -173,26 +370,29 @@ class ChannelStorage(channel.Storage):
         :return: Результат вставки в БД
         :rtype: bool
         """
-        try:
-            cursor = self.db.session.cursor()
-            cursor.execute(self.insert_channel_query, (channel.username,
-                                                       channel.name,
-                                                       channel.tg_link,
-                                                       channel.tg_id,
-                                                       channel.category,
-                                                       channel.sub_count,
-                                                       channel.avg_coverage,
-                                                       channel.er,
-                                                       channel.cpm,
-                                                       channel.post_price,
-                                                       channel.photo_path))
-            self.db.session.commit()
-            self.logger.info(f"Канала ID{channel.id} добавлен")
-            return True
-        except IntegrityError:
-            self.db.session.rollback()
-            self.logger.info(f"Канал ID{channel.id} уже существует")
-            return False
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(self.insert_channel_query,
+                               (channel.username,
+                                channel.name,
+                                channel.tg_link,
+                                channel.tg_id,
+                                channel.category,
+                                channel.sub_count,
+                                channel.avg_coverage,
+                                channel.er,
+                                channel.cpm,
+                                channel.post_price,
+                                channel.photo_path))
+                conn.commit()
+                self.invalidate_cache()
+                self.logger.info(f"Канала ID{channel.id} добавлен")
+                return True
+            except IntegrityError:
+                conn.rollback()
+                self.logger.info(f"Канал ID{channel.id} уже существует")
+                return False
 
     def get_channel_by_id(self, id: int) -> channel.Channel:
         """Метод получения пользователя в базе данных
@@ -203,13 +403,14 @@ class ChannelStorage(channel.Storage):
         :return: Канал из БД
         :rtype: Channel
         """
-        cursor = self.db.session.cursor()
-        cursor.execute(self.get_channel_by_id_query, (id, ))
-        row = cursor.fetchone()
-        if row is not None:
-            return scan_channel(row)
-        else:
-            return None
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_channel_by_id_query, (id, ))
+            row = cursor.fetchone()
+            if row is not None:
+                return scan_channel(row)
+            else:
+                return None
 
     def update_data_from_fetcher(self, channel: channel.Channel):
         """Метод обновления данных каналов из Телеграм клиента
@@ -218,68 +419,147 @@ class ChannelStorage(channel.Storage):
             Объект канала
             :type channel: Channel
         """
-        try:
-            cursor = self.db.session.cursor()
-            cursor.execute(
-                self.update_channel_fields_query, (channel.sub_count,
-                                                   channel.avg_coverage,
-                                                   channel.er,
-                                                   channel.photo_path,
-                                                   channel.tg_link,
-                                                   channel.cpm,
-                                                   channel.tg_id,
-                                                   ))
-
-            self.db.session.commit()
-
-        except Exception as e:
-            self.logger.error(f"Ошибка обновления данных с фетчера - {e}")
-            self.db.session.rollback()
-
-    def update_post_price(self, channel: channel.Channel):
-        """Метод обновления цены данных за пост
-
-        :param channel:
-            Объект канала
-            :type channel: Channel
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    self.update_channel_fields_query, (channel.sub_count,
+                                                       channel.avg_coverage,
+                                                       channel.er,
+                                                       channel.photo_path,
+                                                       channel.tg_link,
+                                                       channel.cpm,
+                                                       channel.tg_id,
+                                                       ))
+
+                conn.commit()
+                self.invalidate_cache()
+
+            except Exception as e:
+                self.logger.error(f"Ошибка обновления данных с фетчера - {e}")
+                conn.rollback()
+
+    def update_many_from_fetcher(self,
+                                 channels: list[channel.Channel]) -> dict:
+        """Метод обновления данных списка каналов из Телеграм клиента
+        одним запросом в одной транзакции. CPM пересчитывается в запросе
+        по текущей цене поста
+
+        :param channels:
+            Список объектов каналов
+            :type channels: list[Channel]
+        :return: Пересчитанный CPM обновлённых каналов по Telegram ID
+            или None при ошибке
+        :rtype: dict[str, int]
         """
-        try:
-            cursor = self.db.session.cursor()
-            cursor.execute(self.update_post_price_query, (channel.post_price,
-                                                          channel.id,))
-            data = cursor.fetchone()
-            if data is None:
-                return False
-            else:
-                self.db.session.commit()
-                return True
-        except Exception as e:
-            self.db.session.rollback()
-            self.logger.error(f"Ошибка обновления цены данных за пост - {e}")
-            return False
-
-    def get_channels_to_doc(self, id_data: tuple) -> list[channel.Channel]:
-        """Метод получения каналов, необходимых для добавления в EXEL файл
-
-        :param
-            id_data: ID каналов, которые нужно выгрузить
-            :type id_data: tuple
-        :return:
-            Каналы из БД
-            :rtype: list[channel.Channel]
+        if channels == []:
+            return {}
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                data = execute_values(
+                    cursor,
+                    self.update_many_from_fetcher_query,
+                    [(item.sub_count,
+                      item.avg_coverage,
+                      item.er,
+                      item.photo_path,
+                      item.tg_link,
+                      item.median_views,
+                      item.trimmed_views,
+                      item.p25_views,
+                      item.p75_views,
+                      item.reach_24h,
+                      item.reach_48h,
+                      item.tg_id) for item in channels],
+                    template=self.update_many_from_fetcher_template,
+                    page_size=len(channels),
+                    fetch=True)
+                conn.commit()
+                self.invalidate_cache()
+                self.logger.info(f"Обновлены данные {len(data)} каналов")
+                return {row[0]: row[1] for row in data}
+            except Exception as e:
+                self.logger.error(f"Ошибка обновления данных с фетчера - {e}")
+                conn.rollback()
+                return None
+
+    def update_post_price(self, channels: list[channel.Channel]) -> list[int]: # noqa
+        """Метод обновления цены за пост списка каналов одним запросом
+        в одной транзакции. CPM пересчитывается в том же запросе
+
+        :param channels:
+            Объекты каналов с ID и новой ценой
+            :type channels: list[Channel]
+        :return: ID обновлённых каналов или None при ошибке
+        :rtype: list[int]
         """
-        cursor = self.db.session.cursor()
-        try:
-            cursor.execute(self.get_channels_in_range_query, (id_data, ))
-        except Exception:
-            self.db.session.rollback()
-            self.logger.error("Ошибка получения данных для скачивания - {e}")
-            return None
-        row = cursor.fetchall()
-        if row is not None:
-            return scan_channels(row)
-        else:
-            return None
+        if channels == []:
+            return []
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                data = execute_values(cursor,
+                                      self.update_post_price_query,
+                                      [(item.id, item.post_price)
+                                       for item in channels],
+                                      template=self.update_post_price_template, # noqa
+                                      page_size=len(channels),
+                                      fetch=True)
+                conn.commit()
+                if data != []:
+                    self.invalidate_cache()
+                return [row[0] for row in data]
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка обновления цены данных за пост - {e}") # noqa
+                return None
+
+    def iter_channels_to_doc(self, id_data: tuple = None,
+                             filters: dict = None,
+                             sort: str = default_sort,
+                             chunk_size: int = default_chunk_size
+                             ) -> Iterator[channel.Channel]:
+        """Генератор каналов для выгрузки в файл.
+        Строки читаются серверным курсором порциями по chunk_size,
+        соединение занято, пока генератор не будет исчерпан или закрыт
+
+        :param id_data:
+            ID каналов, которые нужно выгрузить, defaults to None
+            :type id_data: tuple, optional
+        :param filters:
+            Фильтры в формате параметров get_all, defaults to None
+            :type filters: dict, optional
+        :param sort:
+            Поле сортировки, с префиксом "-" по убыванию, defaults to "id"
+            :type sort: str, optional
+        :param chunk_size:
+            Количество строк, получаемых за один запрос к БД
+            :type chunk_size: int, optional
+        :return: Каналы из БД
+        :rtype: Iterator[channel.Channel]
+        """
+        values = dict(filters or {})
+        if id_data is not None:
+            values["ids"] = list(id_data)
+        active = tuple(key for key in channel_filters
+                       if values.get(key) is not None)
+        params = tuple(values[key] for key in active)
+        query = build_listing_query(self.get_channels_export_query,
+                                    active, sort, False)
+
+        with self.db.connection() as conn:
+            cursor = conn.cursor(name=f"channels_doc_{uuid4().hex}")
+            cursor.itersize = chunk_size
+            try:
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield scan_channel(row)
+            except Exception as e:
+                self.logger.error(f"Ошибка получения данных для скачивания - {e}") # noqa
+                raise
+            finally:
+                conn.rollback()
 
     def delete(self, id: int) -> bool:
         """Метод удаления канала
@@ -291,20 +571,47 @@ class ChannelStorage(channel.Storage):
             Результат операции
             :rtype: bool
         """
-        cursor = self.db.session.cursor()
-        try:
-            cursor.execute(self.delete_channel_query, (id, ))
-            data = cursor.fetchone()
-            if data == []:
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.delete_channel_query, (id, ))
+                data = cursor.fetchone()
+                if data == []:
+                    return False
+                else:
+                    conn.commit()
+                    self.invalidate_cache()
+                    self.logger.info(f"Канал под ID: {id} удалён")
+                    return True
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка при удалении канала под ID: {id} - {e}") # noqa
                 return False
-            else:
-                self.db.session.commit()
-                self.logger.info(f"Канал под ID: {id} удалён")
-                return True
-        except Exception as e:
-            self.db.session.rollback()
-            self.logger.error(f"Ошибка при удалении канала под ID: {id} - {e}")
-            return False
+
+    def delete_many(self, id_list: list[int]) -> list[tuple]:
+        """Метод удаления списка каналов одним запросом
+
+        :param
+            id_list: ID каналов
+            :type id_list: list[int]
+        :return:
+            ID и Telegram ID удалённых каналов или None при ошибке
+            :rtype: list[tuple[int, str]]
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.delete_channels_query, (id_list, ))
+                data = cursor.fetchall()
+                conn.commit()
+                if data != []:
+                    self.invalidate_cache()
+                self.logger.info(f"Удалены каналы под ID: {[row[0] for row in data]}") # noqa
+                return data
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка при удалении каналов под ID: {id_list} - {e}") # noqa
+                return None
 
     def get_user_channels(self, user_id: int):
         """Получения списка каналов пользователя
@@ -315,18 +622,19 @@ class ChannelStorage(channel.Storage):
         :return: Список каналов
         :rtype: List[Channel]
         """
-        cursor = self.db.session.cursor()
-        try:
-            cursor.execute(self.get_user_channels_query, (user_id, ))
-        except Exception as e:
-            self.db.session.rollback()
-            self.logger.error(f"Ошибка при получения списка каналов пользователя ID: {user_id}- {e}") # noqa
-            return False
-        data = cursor.fetchall()
-        if data == []:
-            return None
-        else:
-            return scan_channels(data)
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.get_user_channels_query, (user_id, ))
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка при получения списка каналов пользователя ID: {user_id}- {e}") # noqa
+                return False
+            data = cursor.fetchall()
+            if data == []:
+                return None
+            else:
+                return scan_channels(data)
 
     def get_channel_by_teleg_id(self, teleg_id: str):
         """Получение канала по Telegram ID в базе данных
@@ -337,18 +645,120 @@ class ChannelStorage(channel.Storage):
         :return: Объект Telegrma канала
         :rtype: channel.Channel
         """
-        cursor = self.db.session.cursor()
-        try:
-            cursor.execute(self.get_channel_by_teleg_id_query, (teleg_id, ))
-            data = cursor.fetchone()
-            if data is not None:
-                return scan_channel(data)
-            else:
-                return []
-        except Exception as e:
-            self.db.session.rollback()
-            self.logger.error(f"Ошибка при получении данных по каналу ID: {teleg_id} - {e}") # noqa
-            return False
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.get_channel_by_teleg_id_query,
+                               (teleg_id, ))
+                data = cursor.fetchone()
+                if data is not None:
+                    return scan_channel(data)
+                else:
+                    return []
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка при получении данных по каналу ID: {teleg_id} - {e}") # noqa
+                return False
+
+    def get_photo_paths(self) -> set[str]:
+        """Метод получения путей к аватарам всех каналов
+
+        :return: Пути к аватарам или None при ошибке
+        :rtype: set[str]
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.get_photo_paths_query)
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка получения аватаров каналов - {e}") # noqa
+                return None
+            return {row[0] for row in cursor.fetchall()}
+
+    def get_version(self) -> tuple:
+        """Метод получения версии данных каналов.
+        Версия увеличивается триггером при любом изменении таблицы channels
+
+        :return: Номер версии и время последнего изменения
+        :rtype: tuple[int, datetime]
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_version_query)
+            row = cursor.fetchone()
+            if row is None:
+                return 0, None
+            return row[0], row[1]
+
+
+@lru_cache(maxsize=512)
+def build_listing_query(template: str, active: tuple, sort: str,
+                        seek: bool) -> str:
+    """Функция построения запроса списка каналов.
+    В условие попадают только переданные фильтры, поэтому планировщик
+    может выбрать подходящий индекс. Текст запроса кэшируется по набору
+    активных фильтров
+
+    :param template:
+        Шаблон запроса
+        :type template: str
+    :param active:
+        Названия активных фильтров
+        :type active: tuple
+    :param sort:
+        Поле сортировки, с префиксом "-" по убыванию
+        :type sort: str
+    :param seek:
+        Запрос страницы по курсору
+        :type seek: bool
+    :return: SQL запрос
+    :rtype: str
+    """
+    sort_field = sort.lstrip("-")
+    descending = sort.startswith("-")
+    where = " AND ".join(channel_filters[key] for key in active)
+    order = order_by.format(sort=sort_field,
+                            direction="DESC" if descending else "ASC")
+    seek_sql = "TRUE"
+    if seek:
+        seek_sql = seek_condition(sort_field, descending)
+    return template.format(where=where or "TRUE", seek=seek_sql, order=order)
+
+
+def seek_condition(sort: str, descending: bool) -> str:
+    """Функция построения условия keyset пагинации
+
+    :param sort:
+        Поле сортировки
+        :type sort: str
+    :param descending:
+        Сортировка по убыванию
+        :type descending: bool
+    :return: SQL условие
+    :rtype: str
+    """
+    operator = "<" if descending else ">"
+    if sort == "id":
+        return f"(id {operator} %s)"
+    return f"(({sort}, id) {operator} (%s, %s))"
+
+
+def seek_params(sort: str, after: tuple) -> tuple:
+    """Функция получения параметров условия keyset пагинации
+
+    :param sort:
+        Поле сортировки
+        :type sort: str
+    :param after:
+        Ключ сортировки и ID последнего канала предыдущей страницы
+        :type after: tuple
+    :return: Параметры условия
+    :rtype: tuple
+    """
+    if sort == "id":
+        return (after[1], )
+    return tuple(after)
 
 
 def scan_channel(data: tuple) -> channel.Channel:
@@ -372,7 +782,13 @@ def scan_channel(data: tuple) -> channel.Channel:
         er=data[8],
         cpm=data[9],
         post_price=data[10],
-        photo_path=data[11]
+        photo_path=data[11],
+        median_views=data[12],
+        trimmed_views=data[13],
+        p25_views=data[14],
+        p75_views=data[15],
+        reach_24h=data[16],
+        reach_48h=data[17]
     )
 
 
@@ -392,12 +808,15 @@ def scan_channels(data: list[tuple]) -> list[channel.Channel]:
     return channels
 
 
-def new_storage(db: postgres.DB, logger: logger.Logger) -> ChannelStorage:
+def new_storage(db: postgres.DB, logger: logger.Logger,
+                cache: Cache = None) -> ChannelStorage:
     """Функция инициализации хранилища канала
 
     :param db: объект базы данных
     :type db: postgres.DB
+    :param cache: кэш ответов API, сбрасываемый при изменении каналов
+    :type cache: Cache, optional
     :return: объект хранилища каналов
     :rtype: User
     """
-    return ChannelStorage(db=db, logger=logger)
+    return ChannelStorage(db=db, logger=logger, cache=cache)
@@ -0,0 +1,109 @@
+import os
+import re
+from dataclasses import dataclass
+
+from internal.postgres import postgres
+from pkg.log import logger
+
+migrations_folder = "migrations/"
+migration_file = re.compile(r"^(\d+)_(\w+)\.sql$")
+migrations_lock_id = 7314
+
+
+@dataclass
+class Migration:
+    """Класс миграции схемы БД"""
+    version: str
+    name: str
+    path: str
+
+
+@dataclass
+class Migrator:
+    """Класс применения миграций схемы БД"""
+
+    db: postgres.DB
+    logger: logger.Logger
+    folder: str = migrations_folder
+
+    create_migrations_table_query = "CREATE TABLE IF NOT EXISTS \
+                                     schema_migrations( \
+                                     version TEXT PRIMARY KEY, \
+                                     name TEXT NOT NULL, \
+                                     applied_at TIMESTAMP WITH TIME ZONE \
+                                     DEFAULT NOW())"
+
+    get_applied_query = "SELECT version FROM schema_migrations"
+
+    insert_migration_query = "INSERT INTO schema_migrations (version, name) \
+                              VALUES (%s, %s)"
+
+    lock_query = "SELECT pg_advisory_lock(%s)"
+
+    unlock_query = "SELECT pg_advisory_unlock(%s)"
+
+    def get_migrations(self) -> list[Migration]:
+        """Метод получения списка миграций из папки migrations
+
+        :return: Миграции в порядке версий
+        :rtype: list[Migration]
+        """
+        migrations = []
+        for file_name in os.listdir(self.folder):
+            match = migration_file.match(file_name)
+            if match is None:
+                continue
+            migrations.append(Migration(version=match.group(1),
+                                        name=match.group(2),
+                                        path=os.path.join(self.folder,
+                                                          file_name)))
+        return sorted(migrations, key=lambda item: int(item.version))
+
+    def migrate(self) -> list[Migration]:
+        """Метод применения ещё не применённых миграций.
+        Каждая миграция выполняется в отдельной транзакции
+
+        :return: Применённые миграции
+        :rtype: list[Migration]
+        """
+        applied_now = []
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.lock_query, (migrations_lock_id, ))
+            try:
+                cursor.execute(self.create_migrations_table_query)
+                cursor.execute(self.get_applied_query)
+                applied = {row[0] for row in cursor.fetchall()}
+                conn.commit()
+
+                for migration in self.get_migrations():
+                    if migration.version in applied:
+                        continue
+                    with open(migration.path, encoding="UTF-8") as f:
+                        sql = f.read()
+                    try:
+                        cursor.execute(sql)
+                        cursor.execute(self.insert_migration_query,
+                                       (migration.version, migration.name))
+                        conn.commit()
+                    except Exception as e:
+                        conn.rollback()
+                        self.logger.error(f"Ошибка применения миграции {migration.version}_{migration.name} - {e}") # noqa
+                        raise
+                    self.logger.info(f"Применена миграция {migration.version}_{migration.name}") # noqa
+                    applied_now.append(migration)
+            finally:
+                cursor.execute(self.unlock_query, (migrations_lock_id, ))
+                conn.commit()
+        return applied_now
+
+
+def new_migrator(db: postgres.DB, logger: logger.Logger) -> Migrator:
+    """Функция инициализации мигратора
+
+    :param db: объект базы данных
+    :type db: postgres.DB
+    :return: объект мигратора
+    :rtype: Migrator
+    """
+    return Migrator(db=db, logger=logger)
@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+
+from internal.postgres import postgres
+from internal.posts import post
+from pkg.log import logger
+from psycopg2.extras import execute_values
+
+post_fields = "tg_id, message_id, date, views"
+
+checkpoint_fields = "tg_id, last_message_id, last_message_date"
+
+
+@dataclass
+class PostStorage(post.Storage):
+    """Реализация абстрактного класса Storage постов"""
+
+    db: postgres.DB
+    logger: logger.Logger
+
+    get_checkpoint_query = f"SELECT {checkpoint_fields} \
+                            FROM fetcher_checkpoints WHERE tg_id = %s"
+
+    get_posts_query = f"SELECT {post_fields} FROM channel_posts \
+                       WHERE tg_id = %s AND date >= %s ORDER BY message_id"
+
+    delete_posts_query = "DELETE FROM channel_posts WHERE tg_id = %s"
+
+    insert_posts_query = f"INSERT INTO channel_posts ({post_fields}) \
+                          VALUES %s"
+
+    upsert_checkpoint_query = f"INSERT INTO fetcher_checkpoints \
+                               ({checkpoint_fields}) VALUES (%s, %s, %s) \
+                               ON CONFLICT (tg_id) DO UPDATE SET \
+                               last_message_id = EXCLUDED.last_message_id, \
+                               last_message_date = \
+                               EXCLUDED.last_message_date, \
+                               updated_at = NOW()"
+
+    def get_checkpoint(self, tg_id: str) -> post.Checkpoint:
+        """Метод получения контрольной точки канала
+
+        :param tg_id:
+            Telegram ID канала
+            :type tg_id: str
+        :return: Контрольная точка или None, если канал ещё не обходился
+        :rtype: post.Checkpoint
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_checkpoint_query, (tg_id, ))
+            row = cursor.fetchone()
+            if row is not None:
+                return scan_checkpoint(row)
+            else:
+                return None
+
+    def get_posts(self, tg_id: str, since: int) -> list[post.Post]:
+        """Метод получения сохранённых постов канала за период
+
+        :param tg_id:
+            Telegram ID канала
+            :type tg_id: str
+        :param since:
+            Начало периода, unix timestamp
+            :type since: int
+        :return: Список постов
+        :rtype: list[post.Post]
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_posts_query, (tg_id, since))
+            row = cursor.fetchall()
+            return scan_posts(row)
+
+    def save(self, checkpoint: post.Checkpoint, posts: list[post.Post]):
+        """Метод сохранения окна постов и контрольной точки канала.
+        Посты канала, не вошедшие в окно, удаляются
+
+        :param checkpoint:
+            Новая контрольная точка
+            :type checkpoint: post.Checkpoint
+        :param posts:
+            Актуальные посты канала за период
+            :type posts: list[post.Post]
+        """
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(self.delete_posts_query, (checkpoint.tg_id, ))
+                execute_values(cursor, self.insert_posts_query,
+                               [(item.tg_id,
+                                 item.message_id,
+                                 item.date,
+                                 item.views) for item in posts])
+                cursor.execute(self.upsert_checkpoint_query,
+                               (checkpoint.tg_id,
+                                checkpoint.last_message_id,
+                                checkpoint.last_message_date))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка сохранения постов канала {checkpoint.tg_id} - {e}") # noqa
+
+
+def scan_post(data: tuple) -> post.Post:
+    """Преобразование SQL ответа в объект Post
+
+    :param data:
+        SQL ответ
+        :type data: tuple
+    :return: Объект поста
+    :rtype: Post
+    """
+    return post.Post(
+        tg_id=data[0],
+        message_id=data[1],
+        date=data[2],
+        views=data[3]
+    )
+
+
+def scan_posts(data: list[tuple]) -> list[post.Post]:
+    """Функция преобразовния SQL ответа в список объектов Post
+
+    :param data: SQL ответ из базы
+    :type data: list[tuple]
+    :return: Список постов
+    :rtype: list[Post]
+    """
+    posts = []
+    for row in data:
+        posts.append(scan_post(row))
+
+    return posts
+
+
+def scan_checkpoint(data: tuple) -> post.Checkpoint:
+    """Преобразование SQL ответа в объект Checkpoint
+
+    :param data:
+        SQL ответ
+        :type data: tuple
+    :return: Контрольная точка канала
+    :rtype: Checkpoint
+    """
+    return post.Checkpoint(
+        tg_id=data[0],
+        last_message_id=data[1],
+        last_message_date=data[2]
+    )
+
+
+def new_storage(db: postgres.DB, logger: logger.Logger) -> PostStorage:
+    """Функция инициализации хранилища постов
+
+    :param db: объект базы данных
+    :type db: postgres.DB
+    :return: объект хранилища постов
+    :rtype: PostStorage
+    """
+    return PostStorage(db=db, logger=logger)
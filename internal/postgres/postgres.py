@@ -1,7 +1,17 @@
-from dataclasses import dataclass
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from threading import BoundedSemaphore, Lock
 
 import psycopg2
 from pkg.log import logger
+from psycopg2 import extensions, pool
+
+default_min_connections = 1
+default_max_connections = 10
+checkout_timeout = 30
+checkout_attempts = 3
+health_check_interval = 30
 
 
 @dataclass
@@ -12,20 +22,131 @@ class Config:
     password: str
     host: str
     port: str
+    min_connections: int = default_min_connections
+    max_connections: int = default_max_connections
 
 
 @dataclass
 class DB:
-    """Класс базы данных"""
-    session: int
+    """Класс базы данных с пулом соединений"""
+    pool: pool.ThreadedConnectionPool
     logger: logger.Logger
+    _semaphore: BoundedSemaphore = field(init=False, repr=False)
+    _last_used: dict = field(init=False, repr=False)
+    _lock: Lock = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._semaphore = BoundedSemaphore(self.pool.maxconn)
+        self._last_used = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер получения соединения из пула.
+        Незавершённая транзакция откатывается при возврате соединения,
+        разорванные соединения закрываются и заменяются новыми
+
+        :return: Соединение с базой данных
+        :rtype: psycopg2.extensions.connection
+        """
+        if not self._semaphore.acquire(timeout=checkout_timeout):
+            raise pool.PoolError("Нет свободных соединений в пуле")
+        conn = None
+        broken = False
+        try:
+            conn = self._checkout()
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if conn is not None:
+                self._release(conn, broken)
+            self._semaphore.release()
+
+    def _checkout(self):
+        """Метод получения живого соединения из пула
+
+        :return: Соединение с базой данных
+        :rtype: psycopg2.extensions.connection
+        """
+        for _ in range(checkout_attempts):
+            conn = self.pool.getconn()
+            with self._lock:
+                last_used = self._last_used.get(id(conn), 0)
+            if time.monotonic() - last_used < health_check_interval and not conn.closed: # noqa
+                return conn
+            if is_alive(conn):
+                return conn
+            self.logger.warning("Соединение с БД разорвано. Переподключение")
+            self._discard(conn)
+        raise psycopg2.OperationalError("Не удалось подключиться к БД")
+
+    def _release(self, conn, broken: bool):
+        """Метод возврата соединения в пул
+
+        :param conn:
+            Соединение с базой данных
+            :type conn: psycopg2.extensions.connection
+        :param broken:
+            Признак разорванного соединения
+            :type broken: bool
+        """
+        if not broken and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    broken = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                broken = True
+
+        if broken or conn.closed:
+            self._discard(conn)
+            return
+
+        with self._lock:
+            self._last_used[id(conn)] = time.monotonic()
+        self.pool.putconn(conn)
+
+    def _discard(self, conn):
+        """Метод закрытия соединения и удаления его из пула
+
+        :param conn:
+            Соединение с базой данных
+            :type conn: psycopg2.extensions.connection
+        """
+        with self._lock:
+            self._last_used.pop(id(conn), None)
+        self.pool.putconn(conn, close=True)
 
     def close(self):
-        self.session.close()
+        self.pool.closeall()
+
+
+def is_alive(conn) -> bool:
+    """Функция проверки соединения с базой данных
+
+    :param conn:
+        Соединение с базой данных
+        :type conn: psycopg2.extensions.connection
+    :return: Результат проверки
+    :rtype: bool
+    """
+    if conn.closed:
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
 
 
 def new(cfg: Config, logger: logger.Logger) -> DB:
-    """Создание нового подключения к базе данных
+    """Создание нового пула подключений к базе данных
 
     :param cfg:
         Параметры подключения к базе данных
@@ -36,12 +157,14 @@ def new(cfg: Config, logger: logger.Logger) -> DB:
     :return: объект подключения к базе данных
     :rtype: DB
     """
-    conn = psycopg2.connect(
+    connection_pool = pool.ThreadedConnectionPool(
+        cfg.min_connections,
+        cfg.max_connections,
         database=cfg.database,
         user=cfg.user,
         password=cfg.password,
         host=cfg.host,
         port=cfg.port
     )
-    db = DB(session=conn, logger=logger)
+    db = DB(pool=connection_pool, logger=logger)
     return db
@@ -0,0 +1,267 @@
+import io
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from internal.postgres import postgres
+from internal.stats import stats
+from pkg.log import logger
+
+stats_fields = "tg_id, fetched_at, sub_count, avg_coverage, er, cpm"
+
+copy_null = "\\N"
+
+partition_prefix = "channel_stats_p"
+partition_name = re.compile(r"^channel_stats_p(\d{4})(\d{2})$")
+
+
+@dataclass
+class StatsStorage(stats.Storage):
+    """Реализация абстрактного класса Storage истории статистики.
+    Таблица channel_stats секционирована по месяцам, секции создаются
+    при записи и удаляются целиком по сроку хранения
+    """
+
+    db: postgres.DB
+    logger: logger.Logger
+
+    create_partition_query = "CREATE TABLE IF NOT EXISTS {name} \
+                              PARTITION OF channel_stats \
+                              FOR VALUES FROM (%s) TO (%s)"
+
+    copy_snapshots_query = f"COPY channel_stats ({stats_fields}) FROM STDIN"
+
+    get_partitions_query = "SELECT child.relname FROM pg_inherits \
+                            JOIN pg_class parent \
+                            ON parent.oid = pg_inherits.inhparent \
+                            JOIN pg_class child \
+                            ON child.oid = pg_inherits.inhrelid \
+                            WHERE parent.relname = 'channel_stats'"
+
+    drop_partition_query = "DROP TABLE IF EXISTS {name}"
+
+    bump_version_query = "UPDATE dataset_versions \
+                          SET version = version + 1, updated_at = NOW() \
+                          WHERE name = 'channel_stats'"
+
+    get_version_query = "SELECT version, updated_at FROM dataset_versions \
+                         WHERE name = 'channel_stats'"
+
+    get_history_query = f"SELECT {stats_fields} FROM channel_stats \
+                         WHERE tg_id = %s AND fetched_at >= %s \
+                         ORDER BY fetched_at"
+
+    get_daily_history_query = f"SELECT {stats_fields} FROM ( \
+                               SELECT DISTINCT ON (tg_id, \
+                               date_trunc('day', fetched_at)) {stats_fields} \
+                               FROM channel_stats \
+                               WHERE fetched_at >= %s \
+                               AND tg_id IN (SELECT tg_id FROM channels) \
+                               ORDER BY tg_id, \
+                               date_trunc('day', fetched_at), \
+                               fetched_at DESC) AS daily \
+                               ORDER BY tg_id, fetched_at"
+
+    def save(self, snapshots: list[stats.Snapshot]):
+        """Метод добавления снимков статистики через COPY.
+        Недостающие секции месяцев создаются в той же транзакции
+
+        :param snapshots:
+            Снимки статистики каналов
+            :type snapshots: list[stats.Snapshot]
+        """
+        if snapshots == []:
+            return
+        months = {month_start(item.fetched_at) for item in snapshots}
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                for month in sorted(months):
+                    cursor.execute(
+                        self.create_partition_query.format(
+                            name=partition_prefix + month.strftime("%Y%m")),
+                        (month, next_month(month)))
+                cursor.copy_expert(self.copy_snapshots_query,
+                                   copy_buffer(snapshots))
+                conn.commit()
+                self.logger.info(f"Сохранено {len(snapshots)} снимков статистики") # noqa
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка сохранения статистики каналов - {e}") # noqa
+
+    def get_history(self, tg_id: str,
+                    since: datetime) -> list[stats.Snapshot]:
+        """Метод получения истории статистики канала за период
+
+        :param tg_id:
+            Telegram ID канала
+            :type tg_id: str
+        :param since:
+            Начало периода
+            :type since: datetime
+        :return: Снимки статистики в порядке времени
+        :rtype: list[stats.Snapshot]
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_history_query, (tg_id, since))
+            row = cursor.fetchall()
+            return scan_snapshots(row)
+
+    def get_daily_history(self, since: datetime) -> list[stats.Snapshot]:
+        """Метод получения последнего снимка каждого канала каталога
+        за каждый день периода
+
+        :param since:
+            Начало периода
+            :type since: datetime
+        :return: Снимки статистики, упорядоченные по каналу и времени
+        :rtype: list[stats.Snapshot]
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_daily_history_query, (since, ))
+            row = cursor.fetchall()
+            return scan_snapshots(row)
+
+    def drop_before(self, before: datetime) -> list[str]:
+        """Метод удаления секций, целиком лежащих раньше указанной даты
+
+        :param before:
+            Дата, до которой история удаляется
+            :type before: datetime
+        :return: Удалённые секции
+        :rtype: list[str]
+        """
+        dropped = []
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(self.get_partitions_query)
+                for row in cursor.fetchall():
+                    match = partition_name.match(row[0])
+                    if match is None:
+                        continue
+                    month = datetime(int(match.group(1)), int(match.group(2)),
+                                     1, tzinfo=timezone.utc)
+                    if next_month(month) <= before:
+                        cursor.execute(
+                            self.drop_partition_query.format(name=row[0]))
+                        dropped.append(row[0])
+                if dropped != []:
+                    cursor.execute(self.bump_version_query)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка удаления истории статистики - {e}") # noqa
+                return []
+        if dropped != []:
+            self.logger.info(f"Удалены секции статистики: {dropped}")
+        return dropped
+
+    def get_version(self) -> tuple:
+        """Метод получения версии истории статистики.
+        Версия увеличивается триггером при записи в channel_stats
+        и при удалении секций
+
+        :return: Номер версии и время последнего изменения
+        :rtype: tuple[int, datetime]
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_version_query)
+            row = cursor.fetchone()
+            if row is None:
+                return 0, None
+            return row[0], row[1]
+
+
+def month_start(date: datetime) -> datetime:
+    """Функция получения начала месяца в UTC
+
+    :param date:
+        Дата
+        :type date: datetime
+    :return: Начало месяца
+    :rtype: datetime
+    """
+    date = date.astimezone(timezone.utc)
+    return datetime(date.year, date.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(month: datetime) -> datetime:
+    """Функция получения начала следующего месяца
+
+    :param month:
+        Начало месяца
+        :type month: datetime
+    :return: Начало следующего месяца
+    :rtype: datetime
+    """
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def copy_buffer(snapshots: list[stats.Snapshot]) -> io.StringIO:
+    """Функция подготовки снимков в текстовом формате COPY
+
+    :param snapshots:
+        Снимки статистики каналов
+        :type snapshots: list[stats.Snapshot]
+    :return: Буфер с данными
+    :rtype: io.StringIO
+    """
+    buffer = io.StringIO()
+    for item in snapshots:
+        row = (item.tg_id, item.fetched_at.isoformat(), item.sub_count,
+               item.avg_coverage, item.er, item.cpm)
+        buffer.write("\t".join(copy_null if value is None else str(value)
+                               for value in row) + "\n")
+    buffer.seek(0)
+    return buffer
+
+
+def scan_snapshot(data: tuple) -> stats.Snapshot:
+    """Преобразование SQL ответа в объект Snapshot
+
+    :param data:
+        SQL ответ
+        :type data: tuple
+    :return: Снимок статистики
+    :rtype: Snapshot
+    """
+    return stats.Snapshot(
+        tg_id=data[0],
+        fetched_at=data[1],
+        sub_count=data[2],
+        avg_coverage=data[3],
+        er=data[4],
+        cpm=data[5]
+    )
+
+
+def scan_snapshots(data: list[tuple]) -> list[stats.Snapshot]:
+    """Функция преобразовния SQL ответа в список объектов Snapshot
+
+    :param data: SQL ответ из базы
+    :type data: list[tuple]
+    :return: Список снимков статистики
+    :rtype: list[Snapshot]
+    """
+    snapshots = []
+    for row in data:
+        snapshots.append(scan_snapshot(row))
+
+    return snapshots
+
+
+def new_storage(db: postgres.DB, logger: logger.Logger) -> StatsStorage:
+    """Функция инициализации хранилища истории статистики
+
+    :param db: объект базы данных
+    :type db: postgres.DB
+    :return: объект хранилища истории статистики
+    :rtype: StatsStorage
+    """
+    return StatsStorage(db=db, logger=logger)
@@ -2,6 +2,7 @@ from dataclasses import dataclass
 
 from internal.postgres import postgres
 from internal.users import user
+from pkg.cache.cache import Cache
 from pkg.log import logger
 from psycopg2.errors import UniqueViolation
 
@@ -14,6 +15,7 @@ class UserStorage(user.Storage):
 
     db: postgres.DB
     logger: logger.Logger
+    auth_cache: Cache = None
 
     get_users_query = "SELECT * FROM users"
 
@@ -34,23 +36,24 @@ class UserStorage(user.Storage):
             Объект пользователя
             :type user: User
         """
-        try:
-            cursor = self.db.session.cursor()
-            cursor.execute(self.insert_user_query, (user.username,
-                                                    user.telegram_id,
-                                                    user.auth_code,
-                                                    user.created_at,
-                                                    user.valid_to))
-            self.db.session.commit()
-            return True
-        except UniqueViolation:
-            self.db.session.rollback()
-            self.logger.info(f"Пользователь под ID:{user.id} уже существует")
-            return False
-        except Exception as e:
-            self.db.session.rollback()
-            self.logger.error(f"Ошибка при создании пользователя - {e}")
-            return False
+        with self.db.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(self.insert_user_query, (user.username,
+                                                        user.telegram_id,
+                                                        user.auth_code,
+                                                        user.created_at,
+                                                        user.valid_to))
+                conn.commit()
+                return True
+            except UniqueViolation:
+                conn.rollback()
+                self.logger.info(f"Пользователь под ID:{user.id} уже существует") # noqa
+                return False
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Ошибка при создании пользователя - {e}")
+                return False
 
     def get_all(self) -> list[user.User]:
         """Метод получения всех пользователей в базе данных
@@ -58,12 +61,13 @@ class UserStorage(user.Storage):
         :return: Список пользователей
         :rtype: User
         """
-        cursor = self.db.session.cursor()
-        cursor.execute(self.get_users_query)
-        row = cursor.fetchall()
-        u = scan_users(row)
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_users_query)
+            row = cursor.fetchall()
+            u = scan_users(row)
 
-        return u
+            return u
 
     def get_user_by_id(self, id: int) -> user.User:
         """Метод получения пользователя в базе данных
@@ -74,13 +78,14 @@ class UserStorage(user.Storage):
         :return: Пользователь из БД
         :rtype: User
         """
-        cursor = self.db.session.cursor()
-        cursor.execute(self.get_user_query, (id, ))
-        row = cursor.fetchone()
-        if row is not None:
-            return scan_user(row)
-        else:
-            return None
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_user_query, (id, ))
+            row = cursor.fetchone()
+            if row is not None:
+                return scan_user(row)
+            else:
+                return None
 
     def get_user_by_authcode(self, auth_code: str) -> user.User:
         """Метод проверки авторизации пользователя через телеграм бота
@@ -91,13 +96,14 @@ class UserStorage(user.Storage):
         :return: Пользователя с данным кодом
         :rtype: user.User
         """
-        cursor = self.db.session.cursor()
-        cursor.execute(self.get_users_by_auth_code_query, (auth_code, ))
-        row = cursor.fetchone()
-        if row is not None:
-            return scan_user(row)
-        else:
-            return None
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.get_users_by_auth_code_query, (auth_code, ))
+            row = cursor.fetchone()
+            if row is not None:
+                return scan_user(row)
+            else:
+                return None
 
     def update_auth_key(self, user: user.User):
         """Метод обновления кода авторизации
@@ -106,15 +112,18 @@ class UserStorage(user.Storage):
             Объект пользователя
             :type user: user.User
         """
-        cursor = self.db.session.cursor()
-        cursor.execute(self.update_auth_key_query, (user.auth_code,
-                                                    user.valid_to,
-                                                    user.telegram_id, ))
-        row = cursor.fetchone()
-        if row is not None:
-            self.db.session.commit()
-        else:
-            self.db.session.rollback()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.update_auth_key_query, (user.auth_code,
+                                                        user.valid_to,
+                                                        user.telegram_id, ))
+            row = cursor.fetchone()
+            if row is not None:
+                conn.commit()
+                if self.auth_cache is not None:
+                    self.auth_cache.clear()
+            else:
+                conn.rollback()
 
 
 def scan_user(data: tuple) -> user.User:
@@ -153,13 +162,17 @@ def scan_users(data: list[tuple]) -> list[user.User]:
     return users
 
 
-def new_storage(db: postgres.DB, logger: logger.Logger) -> UserStorage:
+def new_storage(db: postgres.DB, logger: logger.Logger,
+                auth_cache: Cache = None) -> UserStorage:
     """Функция инициализации хранилища пользователей
 
     :param db:
         объект базы данных
         :type db: postgres.DB
+    :param auth_cache:
+        кэш авторизации, сбрасываемый при смене кода авторизации
+        :type auth_cache: Cache, optional
     :return: объект хранилища продуктов
     :rtype: User
     """
-    return UserStorage(db=db, logger=logger)
+    return UserStorage(db=db, logger=logger, auth_cache=auth_cache)
@@ -0,0 +1,62 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+
+@dataclass
+class Post:
+    """Класс поста канала"""
+    tg_id: str
+    message_id: int
+    date: int
+    views: int
+
+
+@dataclass
+class Checkpoint:
+    """Класс контрольной точки фетчера по каналу"""
+    tg_id: str
+    last_message_id: int
+    last_message_date: int
+
+
+class Storage(ABC):
+    """Абстрактный класс постов каналов"""
+    @abstractmethod
+    def get_checkpoint(self, tg_id: str) -> Checkpoint:
+        """Метод получения контрольной точки канала
+
+        :param tg_id:
+            Telegram ID канала
+            :type tg_id: str
+        :return: Контрольная точка или None, если канал ещё не обходился
+        :rtype: Checkpoint
+        """
+        pass
+
+    @abstractmethod
+    def get_posts(self, tg_id: str, since: int) -> list[Post]:
+        """Метод получения сохранённых постов канала за период
+
+        :param tg_id:
+            Telegram ID канала
+            :type tg_id: str
+        :param since:
+            Начало периода, unix timestamp
+            :type since: int
+        :return: Список постов
+        :rtype: list[Post]
+        """
+        pass
+
+    @abstractmethod
+    def save(self, checkpoint: Checkpoint, posts: list[Post]):
+        """Метод сохранения окна постов и контрольной точки канала
+
+        :param checkpoint:
+            Новая контрольная точка
+            :type checkpoint: Checkpoint
+        :param posts:
+            Актуальные посты канала за период
+            :type posts: list[Post]
+        """
+        pass
@@ -0,0 +1,195 @@
+import numpy as np
+
+from internal.stats.stats import Snapshot
+
+default_window = 3
+seconds_in_hour = 3600
+seconds_in_day = 86400
+
+ranking_keys = ("sub_growth", "sub_growth_pct", "views_velocity")
+
+
+def columns(snapshots: list[Snapshot]) -> dict:
+    """Функция преобразования снимков в массивы по полям.
+    Пропущенные значения заменяются на NaN
+
+    :param snapshots:
+        Снимки статистики
+        :type snapshots: list[Snapshot]
+    :return: Массивы времени, подписчиков, охвата и ER
+    :rtype: dict[str, np.ndarray]
+    """
+    return {
+        "time": np.array([item.fetched_at.timestamp()
+                          for item in snapshots], dtype=float),
+        "sub_count": np.array([item.sub_count for item in snapshots],
+                              dtype=float),
+        "avg_coverage": np.array([item.avg_coverage for item in snapshots],
+                                 dtype=float),
+        "er": np.array([item.er for item in snapshots], dtype=float),
+    }
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Функция скользящего среднего по последним window точкам.
+    Пропущенные значения не учитываются
+
+    :param values:
+        Значения ряда
+        :type values: np.ndarray
+    :param window:
+        Размер окна
+        :type window: int
+    :return: Скользящее среднее
+    :rtype: np.ndarray
+    """
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0))
+    counts = np.cumsum(valid)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    return np.divide(sums, counts, out=np.full(values.shape, np.nan),
+                     where=counts > 0)
+
+
+def percent_change(values: np.ndarray, base: np.ndarray) -> np.ndarray:
+    """Функция изменения в процентах относительно базы
+
+    :param values:
+        Изменение значения
+        :type values: np.ndarray
+    :param base:
+        Базовое значение
+        :type base: np.ndarray
+    :return: Изменение в процентах, NaN при нулевой базе
+    :rtype: np.ndarray
+    """
+    return np.divide(values * 100, base, out=np.full(values.shape, np.nan),
+                     where=base > 0)
+
+
+def to_list(values: np.ndarray) -> list:
+    """Функция подготовки массива к JSON: округление и NaN в None
+
+    :param values:
+        Массив значений
+        :type values: np.ndarray
+    :return: Список значений
+    :rtype: list
+    """
+    rounded = np.round(values, 2)
+    return [None if np.isnan(value) else value
+            for value in rounded.tolist()]
+
+
+def channel_trend(snapshots: list[Snapshot],
+                  window: int = default_window) -> dict:
+    """Функция расчёта динамики канала по истории снимков:
+    прирост подписчиков, скорость роста охвата и тренд ER
+
+    :param snapshots:
+        Снимки статистики канала в порядке времени
+        :type snapshots: list[Snapshot]
+    :param window:
+        Размер окна скользящего среднего, defaults to 3
+        :type window: int, optional
+    :return: Ряды по точкам и итог за период
+    :rtype: dict
+    """
+    data = columns(snapshots)
+    time = data["time"]
+    subs = data["sub_count"]
+    views = data["avg_coverage"]
+    er = data["er"]
+
+    hours = np.diff(time, prepend=np.nan) / seconds_in_hour
+    sub_delta = np.diff(subs, prepend=np.nan)
+    views_delta = np.diff(views, prepend=np.nan)
+    views_velocity = np.divide(views_delta, hours,
+                               out=np.full(views.shape, np.nan),
+                               where=hours > 0)
+
+    summary = {"sub_growth": None,
+               "sub_growth_pct": None,
+               "views_velocity": None,
+               "er_trend": None}
+    if time.size > 1:
+        days = (time[-1] - time[0]) / seconds_in_day
+        growth = subs[-1:] - subs[:1]
+        summary["sub_growth"] = to_list(growth)[0]
+        summary["sub_growth_pct"] = to_list(percent_change(growth,
+                                                           subs[:1]))[0]
+        if days > 0:
+            summary["views_velocity"] = to_list((views[-1:] - views[:1])
+                                                / days)[0]
+        valid = ~np.isnan(er)
+        if np.count_nonzero(valid) > 1 and np.ptp(time[valid]) > 0:
+            slope = np.polyfit(time[valid] / seconds_in_day, er[valid], 1)[0]
+            summary["er_trend"] = to_list(np.array([slope]))[0]
+
+    points = {"fetched_at": [item.fetched_at.isoformat()
+                             for item in snapshots],
+              "sub_count": to_list(subs),
+              "sub_delta": to_list(sub_delta),
+              "sub_pct_change": to_list(percent_change(sub_delta,
+                                                       subs - sub_delta)),
+              "sub_rolling_mean": to_list(rolling_mean(subs, window)),
+              "avg_coverage": to_list(views),
+              "views_velocity": to_list(views_velocity),
+              "views_rolling_mean": to_list(rolling_mean(views, window)),
+              "er": to_list(er),
+              "er_rolling_mean": to_list(rolling_mean(er, window))}
+
+    return {"count": len(snapshots),
+            "window": window,
+            "summary": summary,
+            "points": points}
+
+
+def growth_ranking(snapshots: list[Snapshot], limit: int,
+                   sort: str = "sub_growth_pct") -> list[dict]:
+    """Функция рейтинга самых быстрорастущих каналов.
+    Снимки разбиваются на ряды каналов без циклов по строкам,
+    для каждого ряда считается рост между первой и последней точкой
+
+    :param snapshots:
+        Снимки статистики, упорядоченные по каналу и времени
+        :type snapshots: list[Snapshot]
+    :param limit:
+        Число каналов в рейтинге
+        :type limit: int
+    :param sort:
+        Показатель рейтинга из ranking_keys, defaults to "sub_growth_pct"
+        :type sort: str, optional
+    :return: Показатели каналов в порядке убывания
+    :rtype: list[dict]
+    """
+    if snapshots == []:
+        return []
+    ids = np.array([item.tg_id for item in snapshots])
+    data = columns(snapshots)
+    time = data["time"]
+    subs = data["sub_count"]
+    views = data["avg_coverage"]
+
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    ends = np.r_[starts[1:], ids.size] - 1
+
+    growth = subs[ends] - subs[starts]
+    days = (time[ends] - time[starts]) / seconds_in_day
+    metrics = {"sub_growth": growth,
+               "sub_growth_pct": percent_change(growth, subs[starts]),
+               "views_velocity": np.divide(views[ends] - views[starts], days,
+                                           out=np.full(days.shape, np.nan),
+                                           where=days > 0)}
+
+    key = metrics[sort]
+    candidates = np.flatnonzero((ends > starts) & ~np.isnan(key))
+    order = candidates[np.argsort(-key[candidates], kind="stable")][:limit]
+
+    result = {"tg_id": ids[ends[order]].tolist(),
+              "sub_count": to_list(subs[ends[order]]),
+              "days": to_list(days[order])}
+    for name, values in metrics.items():
+        result[name] = to_list(values[order])
+    return [dict(zip(result, row)) for row in zip(*result.values())]
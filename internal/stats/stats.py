@@ -0,0 +1,75 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class Snapshot:
+    """Класс снимка статистики канала за один цикл фетчера"""
+    tg_id: str
+    fetched_at: datetime
+    sub_count: int
+    avg_coverage: int
+    er: float
+    cpm: int
+
+
+class Storage(ABC):
+    """Абстрактный класс истории статистики каналов"""
+    @abstractmethod
+    def save(self, snapshots: list[Snapshot]):
+        """Метод добавления снимков статистики
+
+        :param snapshots:
+            Снимки статистики каналов
+            :type snapshots: list[Snapshot]
+        """
+        pass
+
+    @abstractmethod
+    def get_history(self, tg_id: str, since: datetime) -> list[Snapshot]:
+        """Метод получения истории статистики канала за период
+
+        :param tg_id:
+            Telegram ID канала
+            :type tg_id: str
+        :param since:
+            Начало периода
+            :type since: datetime
+        :return: Снимки статистики в порядке времени
+        :rtype: list[Snapshot]
+        """
+        pass
+
+    @abstractmethod
+    def get_daily_history(self, since: datetime) -> list[Snapshot]:
+        """Метод получения последнего снимка каждого канала за каждый день
+
+        :param since:
+            Начало периода
+            :type since: datetime
+        :return: Снимки статистики, упорядоченные по каналу и времени
+        :rtype: list[Snapshot]
+        """
+        pass
+
+    @abstractmethod
+    def drop_before(self, before: datetime) -> list[str]:
+        """Метод удаления истории старше указанной даты
+
+        :param before:
+            Дата, до которой история удаляется
+            :type before: datetime
+        :return: Удалённые секции
+        :rtype: list[str]
+        """
+        pass
+
+    @abstractmethod
+    def get_version(self) -> tuple:
+        """Метод получения версии истории статистики
+
+        :return: Номер версии и время последнего изменения
+        :rtype: tuple[int, datetime]
+        """
+        pass
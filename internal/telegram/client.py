@@ -1,11 +1,168 @@
-from dataclasses import dataclass
+import asyncio
+import inspect
+import math
+from concurrent import futures
+from dataclasses import dataclass, field
+from threading import Lock, Thread
 
+from internal.telegram.scheduler import RequestScheduler
 from pyrogram import Client
 
+request_timeout = 60
+leave_concurrency = 10
+
+
+def unwrap_client(client: Client):
+    """Функция снятия синхронных обёрток Pyrogram с методов клиента.
+    Обёртка из pyrogram.sync вне главного потока ждёт результат
+    в том же цикле событий, в котором выполняется, поэтому в сессии
+    в отдельном потоке методы клиента вызываются как корутины
+
+    :param client:
+        Клиент Pyrogram
+        :type client: Client
+    """
+    for name in dir(type(client)):
+        if name.startswith("_"):
+            continue
+        function = inspect.getattr_static(type(client), name, None)
+        original = getattr(function, "__wrapped__", None)
+        if original is None:
+            continue
+        if inspect.iscoroutinefunction(original) or \
+                inspect.isasyncgenfunction(original):
+            setattr(client, name, original.__get__(client))
+
 
 @dataclass
 class TelegramClient:
+    """Класс телеграм клиента.
+    Синхронные методы выполняются в постоянной сессии, которая работает
+    в отдельном потоке со своим циклом событий
+    """
     client: Client
+    scheduler: RequestScheduler = None
+    _loop: asyncio.AbstractEventLoop = field(default=None, init=False,
+                                             repr=False)
+    _thread: Thread = field(default=None, init=False, repr=False)
+    _lock: Lock = field(default_factory=Lock, init=False, repr=False)
+
+    def __post_init__(self):
+        unwrap_client(self.client)
+
+    def start(self):
+        """Метод запуска постоянной сессии клиента.
+        При первом запуске необходимо войти в учётную запись Telegram
+        """
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = Thread(target=loop.run_forever,
+                            name="telegram-client",
+                            daemon=True)
+            thread.start()
+            try:
+                self.submit(self.client.start, loop=loop)
+            except Exception:
+                close_loop(loop, thread)
+                raise
+            self._loop = loop
+            self._thread = thread
+
+    def stop(self):
+        """Метод остановки постоянной сессии клиента"""
+        with self._lock:
+            if self._loop is None:
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        try:
+            self.submit(self.client.stop, loop=loop)
+        except (ConnectionError, futures.TimeoutError):
+            pass
+        finally:
+            close_loop(loop, thread)
+
+    def restart(self):
+        """Метод переподключения постоянной сессии клиента"""
+        self.stop()
+        self.start()
+
+    def submit(self, method, *args, loop=None, timeout=request_timeout,
+               **kwargs):
+        """Метод выполнения метода клиента в цикле событий сессии.
+        По истечении времени ожидания вызов отменяется
+
+        :param method:
+            Метод клиента Pyrogram
+            :type method: Callable
+        :param loop:
+            Цикл событий, defaults to None
+            :type loop: asyncio.AbstractEventLoop, optional
+        :param timeout:
+            Время ожидания результата в секундах, defaults to 60
+            :type timeout: float, optional
+        :return: Результат вызова
+        :rtype: Any
+        """
+        async def call():
+            return await method(*args, **kwargs)
+
+        future = asyncio.run_coroutine_threadsafe(call(), loop or self._loop)
+        try:
+            return future.result(timeout=timeout)
+        except futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def run(self, method, *args, timeout=request_timeout, **kwargs):
+        """Метод выполнения запроса в постоянной сессии.
+        Сессия запускается при первом запросе и перезапускается,
+        если соединение было потеряно
+
+        :param method:
+            Метод клиента Pyrogram
+            :type method: Callable
+        :param timeout:
+            Время ожидания результата в секундах, defaults to 60
+            :type timeout: float, optional
+        :return: Результат запроса
+        :rtype: Any
+        """
+        self.start()
+        try:
+            return self.submit(method, *args, timeout=timeout, **kwargs)
+        except ConnectionError:
+            self.restart()
+            return self.submit(method, *args, timeout=timeout, **kwargs)
+
+    async def request(self, method, *args, **kwargs):
+        """Метод выполнения запроса к Telegram через планировщик запросов,
+        если он задан
+
+        :param method:
+            Метод клиента Pyrogram
+            :type method: Callable
+        :return: Результат запроса
+        :rtype: Any
+        """
+        if self.scheduler is None:
+            return await method(*args, **kwargs)
+        return await self.scheduler.call(method, *args, **kwargs)
+
+    def call(self, method, *args, **kwargs):
+        """Метод выполнения запроса к Telegram в постоянной сессии
+        через планировщик запросов
+
+        :param method:
+            Метод клиента Pyrogram
+            :type method: Callable
+        :return: Результат запроса
+        :rtype: Any
+        """
+        return self.run(self.request, method, *args, **kwargs)
 
     def join_to_channel(self, channel_login: str):
         """Метод подписки телеграм клиента на канал.
@@ -15,8 +172,7 @@ class TelegramClient:
             Юзернейм канала
             :type channel_login: str
         """
-        with self.client:
-            result = self.client.join_chat(channel_login)
+        result = self.call(self.client.join_chat, channel_login)
         if result is not None and result.type == "channel":
             return result
         else:
@@ -29,8 +185,41 @@ class TelegramClient:
             Логин канала
             :type channel_id: int
         """
-        with self.client:
-            self.client.leave_chat(channel_id, delete=True)
+        self.call(self.client.leave_chat, channel_id, delete=True)
+
+    def leave_channels(self, channel_ids: list[int]) -> dict:
+        """Метод одновременной отписки от списка каналов
+
+        :param channel_ids:
+            ID каналов
+            :type channel_ids: list[int]
+        :return: Ошибка отписки по каждому каналу, None при успехе
+        :rtype: dict[int, Exception | None]
+        """
+        if channel_ids == []:
+            return {}
+
+        async def leave(channel_id: int, semaphore: asyncio.Semaphore):
+            async with semaphore:
+                await asyncio.wait_for(
+                    self.request(self.client.leave_chat, channel_id,
+                                 delete=True),
+                    request_timeout)
+
+        async def leave_all():
+            semaphore = asyncio.Semaphore(leave_concurrency)
+            return await asyncio.gather(*(leave(channel_id, semaphore)
+                                          for channel_id in channel_ids),
+                                        return_exceptions=True)
+
+        rounds = math.ceil(len(channel_ids) / leave_concurrency)
+        try:
+            results = self.run(leave_all,
+                               timeout=(rounds + 1) * request_timeout)
+        except Exception as e:
+            return {channel_id: e for channel_id in channel_ids}
+        return {channel_id: (result if isinstance(result, Exception) else None)
+                for channel_id, result in zip(channel_ids, results)}
 
     def get_chat(self, channel_login: str):
         """Метод проверки существования чата в Telegram по ссылке
@@ -41,6 +230,23 @@ class TelegramClient:
         :return: Информация о диалоге
         :rtype: Chat | None
         """
-        with self.client:
-            res = self.client.get_chat(channel_login)
-            return res
+        res = self.call(self.client.get_chat, channel_login)
+        return res
+
+
+def close_loop(loop: asyncio.AbstractEventLoop, thread: Thread):
+    """Функция остановки цикла событий сессии и его потока.
+    Если цикл заблокирован и не остановился за время ожидания,
+    поток остаётся демоном и цикл не закрывается
+
+    :param loop:
+        Цикл событий
+        :type loop: asyncio.AbstractEventLoop
+    :param thread:
+        Поток цикла событий
+        :type thread: Thread
+    """
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=request_timeout)
+    if not thread.is_alive():
+        loop.close()
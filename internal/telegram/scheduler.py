@@ -0,0 +1,108 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+
+from pkg.log import logger
+from pyrogram.errors import FloodWait, InternalServerError
+
+default_rate = 5
+default_burst = 10
+default_retries = 5
+max_jitter = 1.0
+max_backoff = 60
+
+
+@dataclass
+class RequestScheduler:
+    """Класс планировщика запросов к Telegram.
+    Ограничивает частоту запросов алгоритмом token bucket и повторяет
+    запросы при FloodWait и ошибках сервера
+    """
+    logger: logger.Logger
+    rate: float = default_rate
+    burst: int = default_burst
+    retries: int = default_retries
+    _tokens: float = field(init=False, repr=False)
+    _updated_at: float = field(init=False, repr=False)
+    _paused_until: float = field(init=False, repr=False)
+    _lock: asyncio.Lock = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0
+        self._lock = None
+
+    async def acquire(self):
+        """Метод ожидания свободного токена на запрос"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.burst,
+                                   self._tokens + (now - self._updated_at) * self.rate) # noqa
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def call(self, method, *args, **kwargs):
+        """Метод выполнения запроса к Telegram через планировщик
+
+        :param method:
+            Асинхронный метод клиента Pyrogram
+            :type method: Callable
+        :return: Результат запроса
+        :rtype: Any
+        """
+        attempt = 0
+        while True:
+            await self.acquire()
+            try:
+                return await method(*args, **kwargs)
+            except FloodWait as e:
+                if attempt >= self.retries:
+                    raise
+                delay = e.x + random.uniform(0, max_jitter)
+                self._paused_until = max(self._paused_until,
+                                         time.monotonic() + delay)
+                self.logger.warning(f"FloodWait на {e.x} с. при вызове {method.__name__}") # noqa
+            except (InternalServerError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    raise
+                delay = min(max_backoff, 2 ** attempt) + random.uniform(0, max_jitter) # noqa
+                self.logger.warning(f"Ошибка {e} при вызове {method.__name__}. Повтор через {delay:.1f} с.") # noqa
+                await asyncio.sleep(delay)
+            attempt += 1
+
+
+def new_scheduler(logger: logger.Logger,
+                  rate: float = default_rate,
+                  burst: int = default_burst,
+                  retries: int = default_retries) -> RequestScheduler:
+    """Функция инициализации планировщика запросов к Telegram
+
+    :param logger:
+        Логгер проекта
+        :type logger: logger.Logger
+    :param rate:
+        Число запросов в секунду, defaults to 5
+        :type rate: float, optional
+    :param burst:
+        Максимальное число запросов подряд без ожидания, defaults to 10
+        :type burst: int, optional
+    :param retries:
+        Число повторов запроса, defaults to 5
+        :type retries: int, optional
+    :return: Объект планировщика
+    :rtype: RequestScheduler
+    """
+    return RequestScheduler(logger=logger, rate=rate, burst=burst,
+                            retries=retries)
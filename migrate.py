@@ -0,0 +1,36 @@
+import toml
+
+from internal.postgres import migrations, postgres
+from pkg.log import filelogger
+
+cfg = toml.load("cfg.toml")
+
+
+def configDB(cfg):
+    cfgDB = postgres.Config(
+        database=cfg.get("databases").get("database"),
+        user=cfg.get("databases").get("user"),
+        password=cfg.get("databases").get("password"),
+        host=cfg.get("databases").get("host"),
+        port=cfg.get("databases").get("port"),
+        min_connections=1,
+        max_connections=1
+    )
+    return cfgDB
+
+
+logger = filelogger.new_logger("migrations")
+
+cfgDB = configDB(cfg)
+
+db = postgres.new(cfg=cfgDB, logger=logger)
+
+migrator = migrations.new_migrator(db=db, logger=logger)
+
+if __name__ == "__main__":
+    applied = migrator.migrate()
+    for migration in applied:
+        print(f"Применена миграция {migration.version}_{migration.name}")
+    if applied == []:
+        print("Новых миграций нет")
+    db.close()
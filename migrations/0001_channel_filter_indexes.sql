@@ -0,0 +1,13 @@
+CREATE INDEX IF NOT EXISTS channels_sub_count_idx ON channels (sub_count, id);
+
+CREATE INDEX IF NOT EXISTS channels_avg_coverage_idx ON channels (avg_coverage, id);
+
+CREATE INDEX IF NOT EXISTS channels_er_idx ON channels (er, id);
+
+CREATE INDEX IF NOT EXISTS channels_cpm_idx ON channels (cpm, id);
+
+CREATE INDEX IF NOT EXISTS channels_post_price_idx ON channels (post_price, id);
+
+CREATE INDEX IF NOT EXISTS channels_owner_idx ON channels (owner);
+
+CREATE INDEX IF NOT EXISTS channels_category_idx ON channels (category);
@@ -0,0 +1,5 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS channels_name_trgm_idx ON channels USING GIN (name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS channels_tg_link_trgm_idx ON channels USING GIN (tg_link gin_trgm_ops);
@@ -0,0 +1,21 @@
+CREATE TABLE IF NOT EXISTS dataset_versions(
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO dataset_versions (name) VALUES ('channels') ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_channels_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE dataset_versions SET version = version + 1, updated_at = NOW()
+    WHERE name = 'channels';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS channels_version_trigger ON channels;
+
+CREATE TRIGGER channels_version_trigger
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON channels
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_channels_version();
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS channel_stats(
+    tg_id TEXT NOT NULL,
+    fetched_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    sub_count INTEGER,
+    avg_coverage INTEGER,
+    er REAL,
+    cpm INTEGER,
+    PRIMARY KEY (tg_id, fetched_at)
+) PARTITION BY RANGE (fetched_at);
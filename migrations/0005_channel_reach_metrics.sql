@@ -0,0 +1,19 @@
+ALTER TABLE channels
+    ADD COLUMN IF NOT EXISTS median_views INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS trimmed_views INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS p25_views INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS p75_views INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS reach_24h INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS reach_48h INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS channels_median_views_idx ON channels (median_views, id);
+
+CREATE INDEX IF NOT EXISTS channels_trimmed_views_idx ON channels (trimmed_views, id);
+
+CREATE INDEX IF NOT EXISTS channels_p25_views_idx ON channels (p25_views, id);
+
+CREATE INDEX IF NOT EXISTS channels_p75_views_idx ON channels (p75_views, id);
+
+CREATE INDEX IF NOT EXISTS channels_reach_24h_idx ON channels (reach_24h, id);
+
+CREATE INDEX IF NOT EXISTS channels_reach_48h_idx ON channels (reach_48h, id);
@@ -0,0 +1,3 @@
+DROP INDEX IF EXISTS channels_category_idx;
+
+CREATE INDEX IF NOT EXISTS channels_category_trgm_idx ON channels USING GIN (category gin_trgm_ops);
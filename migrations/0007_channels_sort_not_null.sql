@@ -0,0 +1,10 @@
+UPDATE channels SET
+    sub_count = COALESCE(sub_count, 0),
+    avg_coverage = COALESCE(avg_coverage, 0),
+    post_price = COALESCE(post_price, 0)
+WHERE sub_count IS NULL OR avg_coverage IS NULL OR post_price IS NULL;
+
+ALTER TABLE channels
+    ALTER COLUMN sub_count SET NOT NULL,
+    ALTER COLUMN avg_coverage SET NOT NULL,
+    ALTER COLUMN post_price SET NOT NULL;
@@ -0,0 +1,14 @@
+CREATE TABLE IF NOT EXISTS channel_posts(
+    tg_id TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    date BIGINT NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tg_id, message_id)
+);
+
+CREATE TABLE IF NOT EXISTS fetcher_checkpoints(
+    tg_id TEXT PRIMARY KEY,
+    last_message_id INTEGER NOT NULL,
+    last_message_date BIGINT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
@@ -0,0 +1,15 @@
+INSERT INTO dataset_versions (name) VALUES ('channel_stats') ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_channel_stats_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE dataset_versions SET version = version + 1, updated_at = NOW()
+    WHERE name = 'channel_stats';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS channel_stats_version_trigger ON channel_stats;
+
+CREATE TRIGGER channel_stats_version_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON channel_stats
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_channel_stats_version();
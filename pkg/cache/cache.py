@@ -0,0 +1,47 @@
+from abc import ABC, abstractmethod
+
+
+class Cache(ABC):
+    """Абстрактный класс кэша"""
+    @abstractmethod
+    def get(self, key: str):
+        """Получение значения из кэша
+
+        :param key:
+            Ключ
+            :type key: str
+        :return: Значение или None, если ключа нет или он устарел
+        :rtype: Any
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: float = None):
+        """Сохранение значения в кэш
+
+        :param key:
+            Ключ
+            :type key: str
+        :param value:
+            Значение
+            :type value: Any
+        :param ttl:
+            Время жизни значения в секундах, defaults to None
+            :type ttl: float, optional
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Удаление значения из кэша
+
+        :param key:
+            Ключ
+            :type key: str
+        """
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """Очистка кэша"""
+        pass
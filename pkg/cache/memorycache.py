@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from pkg.cache.cache import Cache
+
+default_maxsize = 1024
+default_ttl = 60
+
+
+class MemoryCache(Cache):
+    """Класс LRU кэша в памяти процесса с ограничением времени жизни
+
+    :param Cache:
+        Абстрактный класс
+        :type Cache: ABC
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float = None):
+        if ttl is None:
+            ttl = self.ttl
+        if ttl <= 0:
+            return
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + ttl)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+def new_cache(maxsize: int = default_maxsize,
+              ttl: float = default_ttl) -> MemoryCache:
+    """Создание нового кэша в памяти
+
+    :param maxsize:
+        Максимальное число записей, defaults to 1024
+        :type maxsize: int, optional
+    :param ttl:
+        Время жизни записи в секундах, defaults to 60
+        :type ttl: float, optional
+    :return: новый кэш
+    :rtype: MemoryCache
+    """
+    return MemoryCache(maxsize, ttl)
@@ -1,3 +1,6 @@
+-- Базовая схема БД. Все последующие изменения вносятся только миграциями
+-- из папки migrations/, которые применяет migrate.py
+
 CREATE TABLE users( 
     id SERIAL PRIMARY KEY, 
     username TEXT,
@@ -35,6 +38,4 @@ CREATE TABLE admin(
     access_token TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     valid_to TIMESTAMP WITH TIME ZONE
-)
-
-
+);
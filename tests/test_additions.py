@@ -0,0 +1,57 @@
+import base64
+import json
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("pyrogram")
+
+from werkzeug.datastructures import MultiDict  # noqa: E402
+
+from apps.telemetr.api import additions  # noqa: E402
+
+
+def raw_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+@pytest.mark.parametrize("sort, value", [("id", 5), ("-er", 2.5),
+                                         ("cpm", 0)])
+def test_cursor_round_trip(sort, value):
+    cursor = additions.encode_cursor(sort, value, 5)
+    assert additions.decode_cursor(cursor, sort) == (value, 5)
+
+
+def test_cursor_for_another_sort_is_rejected():
+    cursor = additions.encode_cursor("er", 1, 5)
+    assert additions.decode_cursor(cursor, "cpm") is None
+
+
+@pytest.mark.parametrize("value", [[1], {"a": 1}, "1", True, None])
+def test_cursor_with_non_numeric_value_is_rejected(value):
+    assert additions.decode_cursor(raw_cursor(["er", value, 5]), "er") is None
+
+
+def test_cursor_with_non_finite_value_is_rejected():
+    cursor = base64.urlsafe_b64encode(b'["er", NaN, 5]').decode()
+    assert additions.decode_cursor(cursor, "er") is None
+
+
+@pytest.mark.parametrize("id", [1.5, "5", True])
+def test_cursor_with_bad_id_is_rejected(id):
+    assert additions.decode_cursor(raw_cursor(["er", 1, id]), "er") is None
+
+
+@pytest.mark.parametrize("cursor", ["!!!", raw_cursor(["er", 1]),
+                                    raw_cursor("er")])
+def test_malformed_cursor_is_rejected(cursor):
+    assert additions.decode_cursor(cursor, "er") is None
+
+
+def test_cache_key_ignores_order_and_empty_values():
+    first = MultiDict([("sort", "er"), ("name", ""), ("limit", "5")])
+    second = MultiDict([("limit", "5"), ("sort", "er")])
+    assert additions.cache_key("channels", first) == \
+        additions.cache_key("channels", second)
+    assert additions.cache_key("channels", first) != \
+        additions.cache_key("doc", first)
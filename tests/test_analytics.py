@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from internal.stats import analytics
+from internal.stats.stats import Snapshot
+
+start = datetime(2021, 3, 1, tzinfo=timezone.utc)
+
+
+def snapshot(tg_id, day, sub_count, avg_coverage=100, er=1.0):
+    return Snapshot(tg_id=tg_id, fetched_at=start + timedelta(days=day),
+                    sub_count=sub_count, avg_coverage=avg_coverage, er=er,
+                    cpm=0)
+
+
+def test_rolling_mean_ignores_missing_values():
+    values = np.array([1, np.nan, 3, 5])
+    result = analytics.rolling_mean(values, 2)
+    assert result.tolist() == pytest.approx([1, 1, 3, 4])
+
+
+def test_channel_trend_summary():
+    history = [snapshot("1", 0, 100, 50, 1.0),
+               snapshot("1", 1, 110, 60, 2.0),
+               snapshot("1", 2, 120, 70, 3.0)]
+    result = analytics.channel_trend(history, window=2)
+    assert result["count"] == 3
+    assert result["summary"] == {"sub_growth": 20.0,
+                                 "sub_growth_pct": 20.0,
+                                 "views_velocity": 10.0,
+                                 "er_trend": 1.0}
+    assert result["points"]["sub_delta"] == [None, 10.0, 10.0]
+    assert result["points"]["sub_rolling_mean"] == [100.0, 105.0, 115.0]
+
+
+def test_channel_trend_single_point_has_no_summary():
+    result = analytics.channel_trend([snapshot("1", 0, 100)])
+    assert set(result["summary"].values()) == {None}
+
+
+def test_growth_ranking_orders_and_limits():
+    history = [snapshot("1", 0, 100), snapshot("1", 2, 150),
+               snapshot("2", 0, 1000), snapshot("2", 2, 1100),
+               snapshot("3", 0, 10), snapshot("3", 2, 12),
+               snapshot("4", 1, 500)]
+    ranking = analytics.growth_ranking(history, 2, "sub_growth_pct")
+    assert [item["tg_id"] for item in ranking] == ["1", "3"]
+    assert ranking[0]["sub_growth"] == 50.0
+    assert ranking[0]["days"] == 2.0
+
+    ranking = analytics.growth_ranking(history, 10, "sub_growth")
+    assert [item["tg_id"] for item in ranking] == ["2", "1", "3"]
+
+
+def test_growth_ranking_empty():
+    assert analytics.growth_ranking([], 10) == []
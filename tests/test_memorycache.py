@@ -0,0 +1,53 @@
+from pkg.cache import memorycache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(monkeypatch, maxsize=2, ttl=10):
+    clock = Clock()
+    monkeypatch.setattr(memorycache.time, "monotonic", clock)
+    return memorycache.new_cache(maxsize, ttl), clock
+
+
+def test_least_recently_used_is_evicted(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache, clock = make_cache(monkeypatch)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    clock.now = 30
+    assert cache.get("b") is None
+
+
+def test_non_positive_ttl_is_not_stored(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+
+
+def test_delete_and_clear(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.delete("a")
+    assert cache.get("a") is None
+    cache.clear()
+    assert cache.get("b") is None
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from apps.fetcher import metrics
+from internal.channels.channel import Channel
+from internal.posts.post import Post
+
+now = 1_700_000_000
+hour = metrics.seconds_in_hour
+
+
+def grouped(groups):
+    channel = np.repeat(np.arange(len(groups)), [len(item) for item in groups])
+    values = np.array([value for item in groups for value in item],
+                      dtype=float)
+    return metrics.sort_groups(channel, values, len(groups))
+
+
+def make_channel(tg_id, sub_count):
+    return Channel(id=0, username=0, name=tg_id, tg_link="", tg_id=tg_id,
+                   category="", sub_count=sub_count, avg_coverage=0, er=0,
+                   cpm=0, post_price=0, photo_path="")
+
+
+@pytest.mark.parametrize("q", [0.25, 0.5, 0.75])
+def test_group_quantile_matches_numpy(q):
+    groups = [[5, 1, 3], [10, 40, 20, 30], [7]]
+    result = metrics.group_quantile(*grouped(groups), q)
+    expected = [np.quantile(item, q) for item in groups]
+    assert result.tolist() == pytest.approx(expected)
+
+
+def test_group_quantile_empty_group_is_zero():
+    result = metrics.group_quantile(*grouped([[], [2, 4]]), 0.5)
+    assert result.tolist() == [0, 3]
+
+
+def test_group_trimmed_mean_drops_both_tails():
+    groups = [list(range(1, 10)) + [1000], [4, 6]]
+    result = metrics.group_trimmed_mean(*grouped(groups))
+    assert result.tolist() == pytest.approx([np.mean(range(2, 10)), 5])
+
+
+def test_group_trimmed_mean_empty_group_is_zero():
+    assert metrics.group_trimmed_mean(*grouped([[]])).tolist() == [0]
+
+
+def test_compute_skips_old_posts_and_missing_views():
+    columns = {"channel": np.array([0, 0, 0, 1]),
+               "date": np.array([now - hour, now - 2 * hour,
+                                 now - 20 * metrics.seconds_in_day, now]),
+               "views": np.array([100, np.nan, 5000, 40], dtype=float)}
+    result = metrics.compute(columns, np.array([1000.0, 0.0]),
+                             metrics.get_cutoff(14, now), now)
+    assert result["count"].tolist() == [1, 1]
+    assert result["avg_views"].tolist() == [100, 40]
+    assert result["er"].tolist() == [10.0, 0]
+
+
+def test_compute_reach_uses_posts_of_matching_age():
+    columns = {"channel": np.zeros(3, dtype=np.int64),
+               "date": np.array([now - 10 * hour, now - 30 * hour,
+                                 now - 60 * hour]),
+               "views": np.array([50, 300, 700], dtype=float)}
+    result = metrics.compute(columns, np.array([1000.0]),
+                             metrics.get_cutoff(14, now), now)
+    assert result["reach_24h"].tolist() == [300]
+    assert result["reach_48h"].tolist() == [700]
+
+
+def test_apply_fills_channel_fields():
+    channels = [make_channel("1", 200), make_channel("2", 100)]
+    date = metrics.get_cutoff(0)
+    posts = [[Post("1", 1, date, 10), Post("1", 2, date, 30)], []]
+    metrics.apply(channels, posts, 14)
+    assert channels[0].avg_coverage == 20
+    assert channels[0].er == 10.0
+    assert channels[0].median_views == 20
+    assert channels[1].avg_coverage == 0
+    assert channels[1].median_views == 0
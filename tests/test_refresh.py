@@ -0,0 +1,76 @@
+import pytest
+
+from apps.fetcher import refresh
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(refresh.random, "uniform", lambda low, high: 1)
+    return refresh.new_scheduler(min_interval=60, max_interval=3600)
+
+
+def test_sync_adds_new_channels_due_now_and_drops_missing(scheduler):
+    scheduler.sync([1, 2, 3], 100)
+    assert len(scheduler) == 3
+    assert scheduler.next_due() == 100
+    scheduler.sync([2, 3], 200)
+    assert len(scheduler) == 2
+    assert scheduler.pop_due(200, 10) == [2, 3]
+
+
+def test_pop_due_respects_time_and_limit(scheduler):
+    scheduler.sync([1, 2, 3], 0)
+    scheduler.schedule(3, 50)
+    assert scheduler.pop_due(10, 1) == [1]
+    assert scheduler.pop_due(10, 5) == [2]
+    assert scheduler.pop_due(10, 5) == []
+    assert scheduler.pop_due(50, 5) == [3]
+
+
+def test_rescheduled_entry_replaces_the_old_one(scheduler):
+    scheduler.sync([1], 0)
+    scheduler.schedule(1, 500)
+    assert scheduler.next_due() == 500
+    assert scheduler.pop_due(100, 5) == []
+
+
+def test_interval_is_clamped(scheduler):
+    assert scheduler.interval(0, 0) == 3600
+    assert scheduler.interval(1000, 0) == 60
+    assert scheduler.interval(2, 0) == pytest.approx(1800)
+
+
+def test_jitter_stays_within_bounds(monkeypatch):
+    scheduler = refresh.new_scheduler(min_interval=60, max_interval=3600)
+    monkeypatch.setattr(refresh.random, "uniform", lambda low, high: high)
+    assert scheduler.interval(0, 0) == 3600
+    monkeypatch.setattr(refresh.random, "uniform", lambda low, high: low)
+    assert scheduler.interval(0, 0) == pytest.approx(3600 * (1 - refresh.jitter)) # noqa
+
+
+def test_reach_velocity_shortens_interval(scheduler):
+    scheduler.sync([1, 2], 0)
+    scheduler.pop_due(0, 5)
+    scheduler.reschedule(1, 0, 0, 1000)
+    scheduler.reschedule(2, 0, 0, 1000)
+    steady = scheduler.reschedule(1, 3600, 0, 1000)
+    growing = scheduler.reschedule(2, 3600, 0, 1100)
+    assert steady == 3600
+    assert growing < steady
+
+
+def test_retry_and_postpone(scheduler):
+    scheduler.sync([1, 2], 0)
+    scheduler.pop_due(0, 5)
+    scheduler.retry(1, 10)
+    scheduler.postpone(2, 10)
+    assert scheduler.pop_due(70, 5) == [1]
+    assert scheduler.pop_due(3610, 5) == [2]
+
+
+def test_removed_channel_is_not_rescheduled(scheduler):
+    scheduler.sync([1], 0)
+    scheduler.pop_due(0, 5)
+    scheduler.sync([], 0)
+    assert scheduler.reschedule(1, 10, 1, 100) is None
+    assert scheduler.next_due() is None